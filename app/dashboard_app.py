@@ -1,16 +1,19 @@
-import os, sqlite3, datetime
+import os, datetime
 import streamlit as st
 from dotenv import load_dotenv
 import pandas as pd
 
 try:
-    from app.rag_engine.embeddings_faiss import build_faiss_from_docs
+    from app.rag_engine.embeddings_faiss import sync_index
 except Exception:
-    build_faiss_from_docs = None
+    sync_index = None
+from app.utils.event_store import get_event_store
+from app.utils import analytics, retention
 
 load_dotenv()
-DB_PATH = os.getenv("DATABASE_PATH")
 DATA_DIR = os.getenv("DATA_DIR", "rag_engine/data")
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", 50))
+DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", 10))
 st.set_page_config(page_title="AutoResQ Dashboard", layout="wide")
 
 st.markdown("""
@@ -159,33 +162,141 @@ st.markdown("""
 
 # ---------- Database Helpers ----------
 @st.cache_resource
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def load_events():
-    conn = get_conn()
-    cur = conn.execute("""
-        SELECT id, incident_id, received_at, event_type, summary, service, status 
-        FROM events ORDER BY id DESC
-    """)
-    return [dict(row) for row in cur.fetchall()]
+def get_store():
+    return get_event_store()  # pooled WAL connections, schema migrated once
+
+def load_page(filters: dict, before_id=None):
+    """One page of events. The newest page is cached in the session and only
+    rows newer than its first id are fetched on reruns / auto-refresh."""
+    if before_id is not None:
+        return get_store().query_events(**filters, before_id=before_id, limit=DASHBOARD_PAGE_SIZE)
+    key = (tuple(sorted(filters.items())), DASHBOARD_PAGE_SIZE)
+    head = st.session_state.get("events_head")
+    if head is None or head["key"] != key:
+        rows = get_store().query_events(**filters, limit=DASHBOARD_PAGE_SIZE)
+    else:
+        last_id = head["rows"][0]["id"] if head["rows"] else 0
+        newer = get_store().query_events(**filters, after_id=last_id, limit=DASHBOARD_PAGE_SIZE)
+        rows = (newer + head["rows"])[:DASHBOARD_PAGE_SIZE]
+    st.session_state["events_head"] = {"key": key, "rows": rows}
+    return rows
+
+def incident_filters() -> dict:
+    store = get_store()
+    c1, c2, c3 = st.columns([2, 2, 3])
+    service = c1.selectbox("Service", ["All"] + store.distinct_values("service"))
+    status = c2.selectbox("Status", ["All"] + store.distinct_values("status"))
+    days = c3.date_input("Received between", value=())
+    filters = {
+        "service": None if service == "All" else service,
+        "status": None if status == "All" else status,
+        "since": days[0].isoformat() if len(days) > 0 else None,
+        "until": (days[1] + datetime.timedelta(days=1)).isoformat() if len(days) > 1 else None,
+    }
+    if st.session_state.get("events_filters") != filters:
+        st.session_state["events_filters"] = filters
+        st.session_state["events_cursors"] = []  # back to the newest page
+    return filters
+
+def incidents_table(filters: dict):
+    cursors = st.session_state.setdefault("events_cursors", [])
+    rows = load_page(filters, cursors[-1] if cursors else None)
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, height=340)
+    elif cursors:
+        st.info("No older incidents.")
+    else:
+        st.info("No incidents yet. Trigger via webhook or manual insert.")
+
+    # Keyset cursors: each older page starts below the last id of the previous one
+    newer, page, older = st.columns([1, 3, 1])
+    newer.button("◀ Newer", disabled=not cursors, on_click=cursors.pop)
+    page.caption(f"Page {len(cursors) + 1} · {len(rows)} incident(s)")
+    older.button("Older ▶", disabled=len(rows) < DASHBOARD_PAGE_SIZE,
+                 on_click=cursors.append, args=(rows[-1]["id"] if rows else None,))
+
+@st.cache_data(max_entries=4, show_spinner="Reading archive…")
+def _archive_month(month: str, parts: tuple):
+    return retention.load_archive_month(month)  # `parts` (path, mtime) keys the cache
+
+def archive_view():
+    """Events moved out by retention, read from their monthly files only on request."""
+    months = retention.archive_months()
+    if not months:
+        st.caption(f"No archived incidents (events older than {retention.EVENT_RETENTION_DAYS:g} days are archived).")
+        return
+    c1, c2 = st.columns([1, 3])
+    month = c1.selectbox("Month", months)
+    search = c2.text_input("Incident ID or service contains")
+    if not st.toggle("Load archive", key="archive_load"):
+        return
+    parts = tuple((p, os.path.getmtime(p)) for p in retention.archive_parts(month))
+    df = _archive_month(month, parts)
+    if search and not df.empty:
+        hit = (df["incident_id"].fillna("").str.contains(search, case=False, regex=False)
+               | df["service"].fillna("").str.contains(search, case=False, regex=False))
+        df = df[hit]
+    st.caption(f"{len(df)} archived incident event(s) · {len(parts)} file(s)")
+    st.dataframe(df.drop(columns=["details", "raw_json"], errors="ignore"), use_container_width=True, height=300)
+    if not df.empty:
+        event_id = st.selectbox("Full payload of event", df["id"].tolist())
+        st.json(df.loc[df["id"] == event_id, "raw_json"].iloc[0] or "{}")
+
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+def analytics_view():
+    """Reads the hourly rollups only (O(buckets)), never the events table."""
+    conn = get_store().conn()
+    days = st.selectbox("Window", [1, 7, 30, 90], index=1, format_func=lambda d: f"Last {d} day(s)")
+    since = analytics.bucket(datetime.datetime.utcnow().timestamp() - days * 86400)
+
+    summary = pd.DataFrame(analytics.service_summary(conn, since))
+    if summary.empty:
+        st.info("No incidents in this window yet.")
+        return
+    c1, c2, c3 = st.columns(3)
+    acks, resolves = summary["acks"].sum(), summary["resolves"].sum()
+    mtta = (summary["mtta_seconds"].fillna(0) * summary["acks"]).sum() / acks if acks else None
+    mttr = (summary["mttr_seconds"].fillna(0) * summary["resolves"]).sum() / resolves if resolves else None
+    c1.metric("Incidents", int(summary["incidents"].sum()))
+    c2.metric("MTTA", f"{mtta / 60:.1f} min" if mtta is not None else "–")
+    c3.metric("MTTR", f"{mttr / 60:.1f} min" if mttr is not None else "–")
+
+    for col in ("mtta_seconds", "mttr_seconds"):
+        summary[col.replace("_seconds", "_min")] = (summary.pop(col) / 60).round(1)
+    st.dataframe(summary, use_container_width=True)
+
+    hourly = pd.DataFrame(analytics.hourly(conn, since))
+    incidents = hourly[hourly["metric"] == "incidents"]
+    if not incidents.empty:
+        st.markdown("**Incidents per service per hour**")
+        st.bar_chart(incidents.pivot_table(index="bucket", columns="service", values="count", aggfunc="sum"))
+    sources = hourly[hourly["metric"].str.startswith("ai_")]
+    if not sources.empty:
+        st.markdown("**AI suggestion sources**")
+        st.bar_chart(sources.assign(source=sources["metric"].str[3:])
+                     .pivot_table(index="service", columns="source", values="count", aggfunc="sum"))
 
 # ---------- Tabs ----------
-tab1, tab2 = st.tabs(["📟 Incidents", "📚 RAG Upload"])
+tab1, tab2, tab3 = st.tabs(["📟 Incidents", "📚 RAG Upload", "📈 Analytics"])
 
 # ---------- TAB 1: Incidents ----------
 with tab1:
     st.markdown("<div class='main-container'>", unsafe_allow_html=True)
     st.markdown("<div class='subheader'>Recent Incidents</div>", unsafe_allow_html=True)
 
-    events = load_events()
-    if events:
-        df = pd.DataFrame(events)
-        st.dataframe(df, use_container_width=True, height=340)
+    filters = incident_filters()
+    auto_refresh = st.toggle(f"Auto-refresh every {DASHBOARD_REFRESH_SECONDS}s", value=False)
+    if _fragment:
+        # Only the table reruns on a timer; it fetches just the rows added since the last run
+        _fragment(run_every=DASHBOARD_REFRESH_SECONDS if auto_refresh else None)(incidents_table)(filters)
     else:
-        st.info("No incidents yet. Trigger via webhook or manual insert.")
+        incidents_table(filters)
+        if auto_refresh:
+            st.caption("Auto-refresh needs Streamlit >= 1.33; use the browser's rerun (R) instead.")
+
+    with st.expander("🗄️ Archived incidents"):
+        archive_view()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -211,9 +322,10 @@ with tab2:
         st.success(f"✅ Uploaded: {', '.join(os.path.basename(f) for f in saved_files)}")
 
         if st.button("🚀 Build / Update FAISS Index"):
-            if build_faiss_from_docs:
+            if sync_index:
                 try:
-                    build_faiss_from_docs(saved_files)
+                    # Incremental: only new/changed files in DATA_DIR are re-embedded
+                    sync_index(DATA_DIR)
                     st.success("🎯 RAG index updated successfully.")
                 except Exception as e:
                     st.error(f"❌ Failed to rebuild FAISS index: {e}")
@@ -223,3 +335,10 @@ with tab2:
         st.info("Upload PDFs or text SOPs to enhance AI knowledge.")
 
     st.markdown("</div>", unsafe_allow_html=True)
+
+# ---------- TAB 3: Analytics ----------
+with tab3:
+    st.markdown("<div class='main-container'>", unsafe_allow_html=True)
+    st.markdown("<div class='subheader'>Incident Analytics</div>", unsafe_allow_html=True)
+    analytics_view()
+    st.markdown("</div>", unsafe_allow_html=True)
@@ -1,18 +1,43 @@
 # llm_providers/bedrock_provider.py
 import boto3, os, json
+from botocore.config import Config
 
 class BedrockProvider:
-    def __init__(self):
-        self.client = boto3.client("bedrock-runtime", region_name=os.getenv("AWS_REGION", "us-west-2"))
+    name = "bedrock"
+
+    def __init__(self, timeout=30.0, max_retries=3, pool_size=10):
+        self.llm_model = os.getenv("BEDROCK_LLM_MODEL", "amazon.titan-text-express-v1")
+        self.embed_model = os.getenv("BEDROCK_EMBED_MODEL", "amazon.titan-embed-text-v2:0")
+        config = Config(
+            connect_timeout=timeout,
+            read_timeout=timeout,
+            retries={"max_attempts": max_retries, "mode": "adaptive"},
+            max_pool_connections=pool_size,
+            tcp_keepalive=True,
+        )
+        self.client = boto3.client("bedrock-runtime", region_name=os.getenv("AWS_REGION", "us-west-2"), config=config)
 
     def get_embedding(self, text):
         body = json.dumps({"inputText": text})
-        resp = self.client.invoke_model(modelId="amazon.titan-embed-text-v2:0", body=body)
+        resp = self.client.invoke_model(modelId=self.embed_model, body=body)
         result = json.loads(resp["body"].read())
         return result["embedding"]
 
-    def generate_text(self, prompt):
-        body = json.dumps({"inputText": prompt, "temperature": 0.3})
-        resp = self.client.invoke_model(modelId="amazon.titan-text-express-v1", body=body)
+    def embed_documents(self, texts):
+        # Titan embeddings take one input per request; the pooled client reuses connections
+        return [self.get_embedding(t) for t in texts]
+
+    def generate_text(self, prompt, temperature=0.3):
+        body = json.dumps({"inputText": prompt, "textGenerationConfig": {"temperature": temperature}})
+        resp = self.client.invoke_model(modelId=self.llm_model, body=body)
         result = json.loads(resp["body"].read())
         return result["results"][0]["outputText"]
+
+    def stream_text(self, prompt, temperature=0.3):
+        """Yield completion text deltas as they arrive."""
+        body = json.dumps({"inputText": prompt, "textGenerationConfig": {"temperature": temperature}})
+        resp = self.client.invoke_model_with_response_stream(modelId=self.llm_model, body=body)
+        for event in resp["body"]:
+            chunk = json.loads(event["chunk"]["bytes"]) if "chunk" in event else {}
+            if chunk.get("outputText"):
+                yield chunk["outputText"]
@@ -1,16 +1,48 @@
 # llm_providers/ollama_provider.py
-import os, requests
+import os, json, requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 class OllamaProvider:
-    def __init__(self):
-        self.model = os.getenv("OLLAMA_MODEL", "llama3")
+    name = "ollama"
+
+    def __init__(self, timeout=30.0, max_retries=3, pool_size=10):
+        self.llm_model = os.getenv("OLLAMA_MODEL", "llama3")
+        self.embed_model = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+        self.timeout = timeout
+        # Keep-alive connection pool; retry connection errors and 5xx from a restarting server
+        retry = Retry(total=max_retries, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=None, raise_on_status=False)
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry))
+
+    def _post(self, path, payload):
+        resp = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def embed_documents(self, texts):
+        return self._post("/api/embed", {"model": self.embed_model, "input": list(texts)})["embeddings"]
 
     def get_embedding(self, text):
-        payload = {"model": "nomic-embed-text", "input": text}
-        resp = requests.post("http://localhost:11434/api/embeddings", json=payload)
-        return resp.json()["embedding"]
+        return self.embed_documents([text])[0]
+
+    def generate_text(self, prompt, temperature=0.3):
+        payload = {"model": self.llm_model, "prompt": prompt, "stream": False, "options": {"temperature": temperature}}
+        return self._post("/api/generate", payload).get("response", "")
 
-    def generate_text(self, prompt):
-        payload = {"model": self.model, "prompt": prompt}
-        resp = requests.post("http://localhost:11434/api/generate", json=payload, stream=False)
-        return resp.json().get("response", "")
+    def stream_text(self, prompt, temperature=0.3):
+        """Yield completion text deltas as they arrive (NDJSON stream)."""
+        payload = {"model": self.llm_model, "prompt": prompt, "stream": True, "options": {"temperature": temperature}}
+        with self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                part = json.loads(line)
+                if part.get("response"):
+                    yield part["response"]
+                if part.get("done"):
+                    break
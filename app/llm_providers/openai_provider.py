@@ -3,17 +3,37 @@ import os
 from openai import OpenAI
 
 class OpenAIProvider:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    name = "openai"
+
+    def __init__(self, timeout=30.0, max_retries=3):
+        self.llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.embed_model = os.getenv("EMBED_MODEL", "text-embedding-3-large")
+        # One client per process: its httpx pool keeps TLS connections alive
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout, max_retries=max_retries)
+
+    def embed_documents(self, texts):
+        resp = self.client.embeddings.create(model=self.embed_model, input=list(texts))
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
 
     def get_embedding(self, text):
-        resp = self.client.embeddings.create(model="text-embedding-3-large", input=text)
-        return resp.data[0].embedding
+        return self.embed_documents([text])[0]
 
-    def generate_text(self, prompt):
+    def generate_text(self, prompt, temperature=0.3):
         resp = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=self.llm_model,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
+            temperature=temperature
         )
         return resp.choices[0].message.content
+
+    def stream_text(self, prompt, temperature=0.3):
+        """Yield completion text deltas as they arrive."""
+        stream = self.client.chat.completions.create(
+            model=self.llm_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
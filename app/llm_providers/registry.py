@@ -0,0 +1,85 @@
+"""
+AutoResQ - llm_providers/registry.py
+------------------------------------
+Single entry point to the LLM / embedding backends.
+
+The provider is chosen by LLM_PROVIDER (openai | bedrock | ollama) and
+created once per process, so its HTTP connection pool (keep-alive, TLS
+sessions) is reused by every alert instead of being set up per call.
+
+Tuning:
+- LLM_TIMEOUT      request timeout in seconds (default 30)
+- LLM_MAX_RETRIES  retries on connection errors / throttling (default 3)
+- LLM_POOL_SIZE    keep-alive connections per host (default 10)
+
+Models come from env: LLM_MODEL / EMBED_MODEL (openai),
+BEDROCK_LLM_MODEL / BEDROCK_EMBED_MODEL, OLLAMA_MODEL / OLLAMA_EMBED_MODEL.
+"""
+
+import os, logging, threading
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+log = logging.getLogger("AutoResQ-AI")
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 10))
+
+PROVIDERS = ("openai", "bedrock", "ollama")
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def _create(name: str):
+    if name == "openai":
+        from app.llm_providers.openai_provider import OpenAIProvider
+        return OpenAIProvider(timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+    if name == "bedrock":
+        from app.llm_providers.bedrock_provider import BedrockProvider
+        return BedrockProvider(timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, pool_size=LLM_POOL_SIZE)
+    if name == "ollama":
+        from app.llm_providers.ollama_provider import OllamaProvider
+        return OllamaProvider(timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, pool_size=LLM_POOL_SIZE)
+    raise ValueError(f"Unknown LLM_PROVIDER {name!r}; expected one of {PROVIDERS}")
+
+
+def get_provider(name: str = None):
+    """Process-wide provider instance (created on first use)."""
+    name = (name or LLM_PROVIDER).lower()
+    provider = _providers.get(name)
+    if provider is None:
+        with _lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = _providers[name] = _create(name)
+                log.info(f"🔌 LLM provider: {name} (llm={provider.llm_model}, embed={provider.embed_model})")
+    return provider
+
+
+class ProviderEmbeddings(Embeddings):
+    """LangChain Embeddings adapter over a registry provider."""
+
+    def __init__(self, provider=None):
+        self.provider = provider or get_provider()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.provider.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.provider.get_embedding(text)
+
+
+def provider_embeddings(name: str = None) -> ProviderEmbeddings:
+    return ProviderEmbeddings(get_provider(name))
+
+
+def generate_text(prompt: str, temperature: float = 0.3) -> str:
+    return get_provider().generate_text(prompt, temperature=temperature)
+
+
+def stream_text(prompt: str, temperature: float = 0.3):
+    """Generator of completion text deltas from the configured provider."""
+    return get_provider().stream_text(prompt, temperature=temperature)
@@ -9,6 +9,10 @@ import logging
 from app.routes.pagerduty_routes import bp as pagerduty_bp
 from app.routes.slack_actions import bp as actions_bp
 from app.routes.slack_commands import bp as commands_bp
+from app.routes.metrics_routes import bp as metrics_bp
+from app.utils.job_queue import start_workers
+from app.utils.event_store import get_event_store
+from app.utils.retention import schedule_retention
 import os
 
 
@@ -19,6 +23,16 @@ def create_app():
     flask_app.register_blueprint(pagerduty_bp)
     flask_app.register_blueprint(actions_bp)
     flask_app.register_blueprint(commands_bp)
+    flask_app.register_blueprint(metrics_bp)
+
+    # Events DB: WAL mode + pending schema migrations, before the first webhook
+    get_event_store()
+
+    # Alert triage + Slack delivery run off the request path (JOB_WORKERS, 0 = off)
+    start_workers()
+
+    # Old events → monthly archive files + incremental VACUUM (EVENT_RETENTION_DAYS, 0 = off)
+    schedule_retention()
 
     return flask_app
 
@@ -1,17 +1,33 @@
 """
 AutoResQ - rag_ai_engine.py (OpenAI Version)
 ----------------------------------------
-RAG + LLM hybrid:
-- If FAISS match score is strong → return SOP snippet (no hallucination)
-- Else → call LLM for reasoning-based suggestion
+RAG + LLM hybrid, at most one LLM call per alert:
+- Near-exact FAISS match with a precomputed section summary → return it (no LLM)
+  (optionally reranked by a local cross-encoder first, RAG_RERANK=1)
+- Strong FAISS match → one LLM call summarizing the relevant SOP steps
+- Else → one LLM call for a generic, reasoning-based suggestion
+LLM and embedding calls go through app/llm_providers/registry.py (LLM_PROVIDER).
 """
 
-import os, logging
+import os, time, logging, threading
+from collections import namedtuple
+from concurrent.futures import TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 from typing import List, Tuple
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings  # ✅ OpenAI imports
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
+from app.rag_engine.index_store import ResidentIndex
+from app.rag_engine.embedding_cache import cached_embeddings
+from app.llm_providers.registry import get_provider, provider_embeddings
+from app.rag_engine.answer_cache import ANSWER_CACHE, get_answer_cache
+from app.rag_engine.hybrid_search import (
+    DENSE_TIMEOUT_SECONDS, HYBRID_CANDIDATES, HYBRID_SEARCH, doc_key, identifier_terms, lexical_search, rrf_fuse,
+    run_with_timeout,
+)
+from app.rag_engine.reranker import RERANK, RERANK_CANDIDATES, get_reranker
+from app.rag_engine.context_builder import CONTEXT_TOKEN_BUDGET, build_context, count_tokens_for, score_cutoff
+from app.utils.alert_coalescer import normalize_summary
+from app.utils import metrics
 
 # -------------------------------------------------------------------
 # Setup
@@ -25,50 +41,106 @@ SCORE_KIND = os.getenv("RAG_SCORE_KIND").lower()
 SIM_THR = float(os.getenv("RAG_SIMILARITY_THRESHOLD"))  # ✅ higher=better
 DIST_THR = float(os.getenv("RAG_DISTANCE_THRESHOLD"))
 
-# ✅ Updated for OpenAI
+# ✅ Provider (openai | bedrock | ollama) from LLM_PROVIDER, one pooled client per process
 INDEX_PATH = os.getenv("INDEX_PATH")
-EMBED_MODEL = os.getenv("EMBED_MODEL")
-LLM_MODEL = os.getenv("LLM_MODEL")
+INDEX_POLL_SECONDS = float(os.getenv("RAG_INDEX_POLL_SECONDS", 5))
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.2))
 
 log.info(f"INDEX_PATH {INDEX_PATH}")
-log.info(f"EMBED_MODEL {EMBED_MODEL}")
-log.info(f"LLM_MODEL {LLM_MODEL}")
 
 # ------------------------------
-def is_high_confidence(score: float) -> bool:
-    if SCORE_KIND == "similarity":
-        return score >= SIM_THR  # ✅ higher is better
-    else:
-        return score <= DIST_THR
+# Score tiers — the only place that knows whether higher (similarity) or
+# lower (distance) is better.
+RELEVANCE_THR = SIM_THR if SCORE_KIND == "similarity" else DIST_THR
+_PERFECT_SCORE = 1.0 if SCORE_KIND == "similarity" else 0.0
+_WORST_SCORE = -1.0 if SCORE_KIND == "similarity" else float("inf")
+# Zero-LLM tier: stricter than relevance (default halfway to a perfect match)
+ZERO_LLM_THR = float(os.getenv("RAG_ZERO_LLM_THRESHOLD") or (RELEVANCE_THR + _PERFECT_SCORE) / 2)
+
+# Two-stage mode (RAG_RERANK=1): cross-encoder probabilities, higher is better
+RERANK_RELEVANCE_THR = float(os.getenv("RAG_RERANK_THRESHOLD", 0.5))
+RERANK_ZERO_LLM_THR = float(os.getenv("RAG_RERANK_ZERO_LLM_THRESHOLD", 0.9))
+
+Tiers = namedtuple("Tiers", "higher_is_better relevance zero_llm context_cutoff")
+DENSE_TIERS = Tiers(SCORE_KIND == "similarity", RELEVANCE_THR, ZERO_LLM_THR, score_cutoff(RELEVANCE_THR))
+RERANK_TIERS = Tiers(True, RERANK_RELEVANCE_THR, RERANK_ZERO_LLM_THR, RERANK_RELEVANCE_THR)
+
+def passes(score: float, threshold: float, tiers: Tiers = DENSE_TIERS) -> bool:
+    if tiers.higher_is_better:
+        return score >= threshold  # ✅ higher is better
+    return score <= threshold
+
+def is_high_confidence(score: float, tiers: Tiers = DENSE_TIERS) -> bool:
+    return passes(score, tiers.relevance, tiers)
+
+def _weakest(scores) -> float:
+    return min(scores) if SCORE_KIND == "similarity" else max(scores)
 
 # -------------------------------------------------------------------
-# Load FAISS index
+# Load FAISS index (resident, hot-reloaded when the builder publishes)
 # -------------------------------------------------------------------
+_resident_index = ResidentIndex(
+    INDEX_PATH,
+    lambda: cached_embeddings(provider_embeddings(), get_provider().embed_model),  # ✅ repeat alerts skip the embedding call
+    poll_seconds=INDEX_POLL_SECONDS,
+)
+
 def load_index():
     if not FAISS:
         log.warning("⚠️ FAISS not available.")
         return None, None
-    if not os.path.exists(INDEX_PATH):
-        log.warning(f"⚠️ FAISS index not found at {INDEX_PATH}")
-        return None, None
-    try:
-        embeddings = OpenAIEmbeddings(model=EMBED_MODEL)  # ✅ replaced BedrockEmbeddings
-        db = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-        log.info(f"✅ Loaded FAISS index ({len(db.index_to_docstore_id)} docs)")
-        return db, embeddings
-    except Exception as e:
-        log.error(f"❌ Failed to load FAISS index: {e}")
-        return None, None
+    return _resident_index.get()
 
 # -------------------------------------------------------------------
 # Search FAISS index and return results
 # -------------------------------------------------------------------
+def _dense_search(db, query: str, k: int):
+    """FAISS top-k, or None when the embedding call fails or exceeds RAG_DENSE_TIMEOUT_SECONDS."""
+    try:
+        return run_with_timeout(lambda: db.similarity_search_with_score(query, k=k))
+    except FutureTimeout:
+        log.warning(f"⏳ Dense search exceeded {DENSE_TIMEOUT_SECONDS}s. Using lexical matches only.")
+        metrics.inc("autoresq_retrieval_fallback_total", reason="timeout", help="Searches served without the dense leg")
+    except Exception as e:
+        log.error(f"❌ FAISS search failed: {e}")
+        metrics.inc("autoresq_retrieval_fallback_total", reason="error")
+    return None
+
+def _hybrid_search(db, query: str, top_k: int) -> List[Tuple[Document, float]]:
+    """RRF of dense and FTS5 candidates, carrying scores on the dense scale for the thresholds.
+
+    Lexical-only hits get the weakest dense candidate score (they ranked below it);
+    without a dense leg, hits naming an exact identifier of the alert sit at the
+    relevance threshold (one LLM call, never the zero-LLM tier) and others below it.
+    """
+    depth = max(top_k, HYBRID_CANDIDATES)  # the reranker asks for RAG_RERANK_CANDIDATES
+    dense = _dense_search(db, query, depth)
+    lexical = lexical_search(db, query, depth)
+    if not lexical:
+        return (dense or [])[:top_k]
+    dense_scores = {doc_key(doc): score for doc, score in dense or []}
+    fallback = _weakest(dense_scores.values()) if dense_scores else None
+    identifiers = identifier_terms(query)
+    results = []
+    for doc in rrf_fuse(dense or [], lexical)[:top_k]:
+        score = dense_scores.get(doc_key(doc), fallback)
+        if score is None:
+            text = doc.page_content.lower()
+            score = RELEVANCE_THR if any(i in text for i in identifiers) else _WORST_SCORE
+        results.append((doc, score))
+    log.info(f"🔀 Hybrid retrieval: {len(dense or [])} dense + {len(lexical)} lexical candidates"
+             f"{'' if dense is not None else ' (dense leg unavailable)'}")
+    return results
+
 def search_faiss_with_score(query: str, top_k: int = 5) -> List[Tuple[Document, float]]:
     db, _ = load_index()
     if not db:
         return []
     try:
-        results = db.similarity_search_with_score(query, k=top_k)
+        if HYBRID_SEARCH:
+            results = _hybrid_search(db, query, top_k)
+        else:
+            results = db.similarity_search_with_score(query, k=top_k)
         for i, (doc, score) in enumerate(results, start=1):
             src = doc.metadata.get("source", "unknown")
             snippet = doc.page_content[:200].replace("\n", " ")
@@ -78,68 +150,158 @@ def search_faiss_with_score(query: str, top_k: int = 5) -> List[Tuple[Document,
         log.error(f"❌ FAISS search failed: {e}")
         return []
 
+def retrieve(query: str, top_k: int = 5):
+    """(results, tiers): first-stage top-k, or with RAG_RERANK the cross-encoder's
+    top-k of RAG_RERANK_CANDIDATES first-stage candidates."""
+    if not RERANK:
+        return search_faiss_with_score(query, top_k), DENSE_TIERS
+    candidates = search_faiss_with_score(query, RERANK_CANDIDATES)
+    reranked = get_reranker().rerank(query, candidates, top_k)
+    if reranked is None:
+        return candidates[:top_k], DENSE_TIERS
+    return reranked, RERANK_TIERS
+
+if RERANK:
+    # load the cross-encoder off the request path
+    threading.Thread(target=get_reranker().load, name="reranker-load", daemon=True).start()
+
 # -------------------------------------------------------------------
 # Hybrid AI suggestion
 # -------------------------------------------------------------------
-def generate_solution(query: str):
+def _answer_cache_vector(query: str, embeddings):
+    """Embedding of the normalized alert (recurring variants differ only in numbers/ids/hosts)."""
+    if not ANSWER_CACHE or embeddings is None:
+        return None
     try:
-        results = search_faiss_with_score(query)
-        if not results:
-            log.warning("⚠️ No FAISS results. Falling back to LLM.")
-            return llm_generate(query, context=None)
+        return run_with_timeout(lambda: embeddings.embed_query(normalize_summary(query)))
+    except FutureTimeout:
+        log.warning(f"⚠️ Answer cache skipped, embedding exceeded {DENSE_TIMEOUT_SECONDS}s")
+        return None
+    except Exception as e:
+        log.warning(f"⚠️ Answer cache skipped, embedding failed: {e}")
+        return None
 
-        top_doc, top_score = results[0]
-        sop_text = top_doc.page_content.strip()
-        source = top_doc.metadata.get("source", "N/A")
+UNAVAILABLE = "AI suggestion unavailable."
 
-        if SCORE_KIND == "similarity":
-            is_relevant = top_score >= SIM_THR
-        else:
-            is_relevant = top_score <= DIST_THR
+def triage(query: str, on_partial=None):
+    """(suggestion, path) for an alert — at most one LLM call.
 
-        log.info(f"🎯 Top FAISS match score={top_score:.3f} | Relevant={is_relevant}")
+    Paths: cache (semantic answer cache) → zero_llm (precomputed SOP section
+    summary for the strongest matches) → sop (one call over the compressed
+    SOP context) → generic (one call, no relevant SOP); error when no usable
+    suggestion was produced (the text is then a fallback message). Only
+    successful answers are cached. Path counts and latency are exported as
+    metrics.
 
-        if is_high_confidence(top_score):
-            log.info("✅ High-confidence match. Returning formatted SOP (no reasoning).")
-            reformat_prompt = f"""
-You are AutoResQ, an AI-powered incident responder.
+    on_partial(text): optional callback receiving the cleaned answer so far while
+    the LLM streams (used for progressive Slack updates).
+    """
+    started = time.perf_counter()
+    path = "error"
+    try:
+        _, embeddings = load_index()
+        vector = _answer_cache_vector(query, embeddings)
+        if vector is not None:
+            hit = get_answer_cache().lookup(vector, _resident_index.version)
+            if hit:
+                answer, source, sim = hit
+                path = "cache"
+                log.info(f"⚡ Answer cache hit (similarity={sim:.3f}, source={source}) | {get_answer_cache().stats()}")
+                return answer, path
 
-The alert says: "{query}"
+        answer, source, path = _generate_uncached(query, on_partial)
+        if vector is not None and path != "error":
+            get_answer_cache().store(vector, answer, source, _resident_index.version)
+        return answer, path
 
-Below is an extracted SOP text which may cover multiple scenarios.
-Only extract and summarize steps that are directly relevant to the alert topic.
-Ignore unrelated sections.
+    except Exception as e:
+        log.error(f"❌ generate_solution failed: {e}")
+        path = "error"
+        return UNAVAILABLE, path
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.inc("autoresq_triage_path_total", path=path, help="Alerts triaged, by answer path")
+        metrics.observe("autoresq_triage_seconds", elapsed, path=path, help="generate_solution latency by path")
+        log.info(f"⏱️ Triage path={path} in {elapsed:.2f}s")
 
-SOP/RCA Text:
-{sop_text}
-"""
-            formatted = llm_generate(reformat_prompt, context=None)
-            return (
-                f":blue_book: *Source:* `{source}`\n"
-                f"{formatted}"
-            )
+def generate_solution(query: str, on_partial=None) -> str:
+    """Suggestion text for an alert (see triage() for the answer path)."""
+    return triage(query, on_partial)[0]
+
+def _generate_with_llm(query: str, context, source=None, header="", on_partial=None):
+    """One LLM call → (answer, source, path); path is error when the LLM gave nothing usable."""
+    stream = (lambda text: on_partial(header + text)) if on_partial else None
+    answer, ok = llm_generate(query, context, on_partial=stream)
+    if not ok:
+        return answer, None, "error"
+    return f"{header}{answer}", source, "sop" if context else "generic"
+
+def _log_context(built):
+    log.info(f"🧮 Context {built.tokens}/{built.budget} tokens from {built.chunks_used} chunk(s), "
+             f"{built.chunks_dropped} dropped | sources={built.sources}")
+
+def _generate_uncached(query: str, on_partial=None):
+    """Retrieval + at most one LLM call. Returns (answer, SOP source or None, path)."""
+    try:
+        results, tiers = retrieve(query)
+        if not results:
+            log.warning("⚠️ No FAISS results. Falling back to LLM.")
+            return _generate_with_llm(query, None, on_partial=on_partial)
+
+        top_doc, top_score = results[0]
+        source = top_doc.metadata.get("source", "N/A")
+        is_relevant = is_high_confidence(top_score, tiers)
+        log.info(f"🎯 Top {'reranked' if tiers is RERANK_TIERS else 'FAISS'} match score={top_score:.3f} | Relevant={is_relevant}")
 
         if not is_relevant:
             log.warning(f"❌ Low relevance (score={top_score:.2f}). Skipping context-based reasoning.")
-            context = None
-        else:
-            context = "\n\n".join([doc.page_content for doc, _ in results])
+            return _generate_with_llm(query, None, on_partial=on_partial)
 
-        return llm_generate(query, context)
+        header = f":blue_book: *Source:* `{source}`\n"
+        summary = top_doc.metadata.get("sop_summary")
+        if summary and passes(top_score, tiers.zero_llm, tiers):
+            log.info("✅ Near-exact SOP match. Returning precomputed section summary (no LLM call).")
+            return f"{header}{summary}", source, "zero_llm"
+
+        log.info("✅ Relevant SOP match. Summarizing relevant steps in a single LLM call.")
+        built = build_context(query, results, lambda score: passes(score, tiers.context_cutoff, tiers), model=get_provider().llm_model)
+        _log_context(built)
+        if not built.text.strip():
+            log.warning("⚠️ No SOP context survived compression. Using the generic prompt.")
+            return _generate_with_llm(query, None, on_partial=on_partial)
+        return _generate_with_llm(query, built.text, source, header, on_partial)
 
     except Exception as e:
         log.error(f"❌ generate_solution failed: {e}")
-        return "AI suggestion unavailable."
+        return UNAVAILABLE, None, "error"
 
 # -------------------------------------------------------------------
 # LLM reasoning helper
 # -------------------------------------------------------------------
-def llm_generate(query: str, context: str):
-    try:
-        # ✅ OpenAI version
-        llm = ChatOpenAI(model_name=LLM_MODEL, temperature=0.2)
+def clean_suggestion(text: str) -> str:
+    """Strip code fences / quotes and blank lines (safe to apply to a partial stream)."""
+    text = text.strip().strip('`').replace('```python', '').replace('```', '')
+    text = text.replace('"""', '').replace("'''", '').strip()
+    return "\n".join([line.strip() for line in text.splitlines() if line.strip()])
+
+def _stream_completion(prompt: str, on_partial) -> str:
+    """Stream the completion, reporting the cleaned text so far after every delta."""
+    provider = get_provider()
+    if not hasattr(provider, "stream_text"):
+        return provider.generate_text(prompt, temperature=LLM_TEMPERATURE)
+    parts = []
+    for delta in provider.stream_text(prompt, temperature=LLM_TEMPERATURE):
+        parts.append(delta)
+        try:
+            on_partial(clean_suggestion("".join(parts)))
+        except Exception as e:
+            log.debug(f"on_partial callback failed: {e}")
+    return "".join(parts)
 
-        if not context or len(context.strip()) < 100:
+def llm_generate(query: str, context: str, on_partial=None):
+    """(suggestion, ok): ok is False when the LLM failed or returned nothing (suggestion is then a fallback message)."""
+    try:
+        if not context:
             prompt = f"""
 You are AutoResQ — an AI-powered incident responder.
 
@@ -159,28 +321,32 @@ You are AutoResQ — an AI-powered incident responder.
 Alert Message:
 {query}
 
-Relevant Context:
+SOP/RCA Context (may cover multiple scenarios):
 {context}
 
-Use the SOP context above only if it is directly relevant.
-If not, provide a general resolution guide instead.
+Only extract and summarize the steps that are directly relevant to the alert topic; ignore unrelated sections.
+If the context is not relevant, provide a general resolution guide instead.
 Respond in plain text or numbered list — do not include code blocks, functions, or markdown fencing.
 """
 
         log.debug("🧠 LLM Prompt:\n%s", prompt[:800])
-        log.info("🧠 LLM Prompt Sent")
-        response = llm.invoke(prompt)
-        suggestion = response.content.strip() if hasattr(response, "content") else str(response).strip()
+        log.info(f"🧠 LLM Prompt Sent ({count_tokens_for(get_provider().llm_model)(prompt)} tokens, "
+                 f"context budget {CONTEXT_TOKEN_BUDGET})")
+        metrics.inc("autoresq_llm_calls_total", help="LLM completions requested")
+        if on_partial:
+            suggestion = _stream_completion(prompt, on_partial)
+        else:
+            suggestion = get_provider().generate_text(prompt, temperature=LLM_TEMPERATURE)
 
         # --- Cleanup ---
-        suggestion = suggestion.strip('`').replace('```python', '').replace('```', '')
-        suggestion = suggestion.replace('"""', '').replace("'''", '').strip()
-        suggestion = "\n".join([line.strip() for line in suggestion.splitlines() if line.strip()])
+        suggestion = clean_suggestion(suggestion or "")
 
         log.debug("🤖 LLM Response (trimmed):\n%s", suggestion[:800])
         log.info("🤖 LLM Response Received")
-        return suggestion or "AI model returned no suggestion."
+        if not suggestion:
+            return "AI model returned no suggestion.", False
+        return suggestion, True
 
     except Exception as e:
         log.error(f"❌ LLM reasoning failed: {e}")
-        return "AI suggestion unavailable."
+        return UNAVAILABLE, False
@@ -0,0 +1,146 @@
+"""
+AutoResQ RAG - ann_index.py
+---------------------------
+Approximate-nearest-neighbour serving indexes for the RAG store.
+
+The builder always keeps an exact IndexFlatL2 (`index.faiss`) as the source
+of truth — it supports the per-source deletes used by incremental
+re-indexing. When RAG_INDEX_TYPE is not "flat", a serving index of that type
+is built from the flat vectors at publish time and stored next to it as
+`index.ann.faiss`; `index_store.ResidentIndex` swaps it in at load time.
+
+Supported RAG_INDEX_TYPE values:
+- flat      exact search (default)
+- ivf_flat  inverted lists, exact vectors        (RAG_IVF_NLIST, RAG_IVF_NPROBE)
+- hnsw      graph index                          (RAG_HNSW_M, RAG_HNSW_EF_CONSTRUCTION, RAG_HNSW_EF_SEARCH)
+- ivf_pq    inverted lists, product-quantized    (+ RAG_PQ_M, RAG_PQ_NBITS)
+
+Use `python -m app.rag_engine.bench_ann_index` to compare recall and latency.
+"""
+
+import os, math, logging
+import numpy as np
+
+log = logging.getLogger("AutoResQ-RAG")
+
+ANN_FILE = "index.ann.faiss"
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat").lower()
+IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", 0))  # 0 → 4·sqrt(n)
+IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", 8))
+HNSW_M = int(os.getenv("RAG_HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", 64))
+PQ_M = int(os.getenv("RAG_PQ_M", 64))
+PQ_NBITS = int(os.getenv("RAG_PQ_NBITS", 8))
+TRAIN_SAMPLE = int(os.getenv("RAG_ANN_TRAIN_SAMPLE", 50000))
+
+# faiss warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def flat_vectors(index) -> np.ndarray:
+    """All vectors of a flat index, in position order."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _nlist_for(n: int) -> int:
+    nlist = IVF_NLIST or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_m_for(dim: int) -> int:
+    """Largest number of sub-quantizers <= PQ_M that divides dim."""
+    return next(m for m in range(min(PQ_M, dim), 0, -1) if dim % m == 0)
+
+
+def _training_sample(vectors: np.ndarray) -> np.ndarray:
+    if len(vectors) <= TRAIN_SAMPLE:
+        return vectors
+    rng = np.random.default_rng(0)
+    return vectors[rng.choice(len(vectors), TRAIN_SAMPLE, replace=False)]
+
+
+def apply_search_params(index):
+    """Set nprobe / efSearch on a (possibly deserialized) ANN index."""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = IVF_NPROBE
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def build_ann_index(vectors: np.ndarray, kind: str = INDEX_TYPE):
+    """Build and train an ANN index of the given kind over vectors.
+
+    Returns None for "flat" or when the corpus is too small to train the
+    requested index; callers then keep serving the exact flat index.
+    """
+    import faiss
+
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown RAG_INDEX_TYPE {kind!r}; expected one of {INDEX_TYPES}")
+    if kind == "flat" or len(vectors) == 0:
+        return None
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        nlist = _nlist_for(n)
+        if n < MIN_POINTS_PER_CENTROID * 2:
+            log.warning(f"⚠️ Only {n} vectors — too few to train {kind}; serving the flat index.")
+            return None
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            nbits = PQ_NBITS if n >= MIN_POINTS_PER_CENTROID * (1 << PQ_NBITS) else 4
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m_for(dim), nbits)
+        index.train(_training_sample(vectors))
+        log.debug(f"Trained {kind}: nlist={nlist}, train_points={min(n, TRAIN_SAMPLE)}")
+
+    index.add(vectors)
+    apply_search_params(index)
+    log.info(f"🧭 Built {kind} serving index over {n} vectors")
+    return index
+
+
+def serialize_ann(index) -> bytes:
+    import faiss
+    return faiss.serialize_index(index).tobytes()
+
+
+def load_ann_index(index_path: str, flat_index, io_flags: int = 0):
+    """Load index.ann.faiss if RAG_INDEX_TYPE asks for it and it matches the flat index.
+
+    io_flags: faiss IO flags, e.g. serving_store.mmap_flags() (IO_FLAG_MMAP_IFC) for serving.
+    """
+    import faiss
+
+    path = os.path.join(index_path, ANN_FILE)
+    if INDEX_TYPE == "flat" or not os.path.exists(path):
+        return None
+    try:
+        try:
+            index = faiss.read_index(path, io_flags)
+        except RuntimeError:
+            if not io_flags:
+                raise
+            index = faiss.read_index(path)  # index type without mmap support
+    except Exception as e:
+        log.warning(f"⚠️ Could not read ANN index {path}: {e}")
+        return None
+    if index.ntotal != flat_index.ntotal or index.d != flat_index.d:
+        log.warning("⚠️ ANN index does not match the flat index (stale build?). Serving flat.")
+        return None
+    return apply_search_params(index)
@@ -0,0 +1,117 @@
+"""
+AutoResQ RAG - answer_cache.py
+------------------------------
+Semantic cache of generated answers, keyed by the embedding of the
+normalized alert text.
+
+Recurring variants of one issue ("Queue depth high on WMQ_IN" with
+different numbers) normalize to (nearly) the same text, so a lookup is a
+cosine search over the cached alert vectors:
+- a hit needs similarity >= RAG_ANSWER_CACHE_THRESHOLD and an entry younger
+  than RAG_ANSWER_CACHE_TTL_SECONDS;
+- entries are evicted least-recently-used beyond RAG_ANSWER_CACHE_MAX_ENTRIES;
+- the whole cache is dropped when the FAISS index version changes, since
+  answers were grounded in the previous SOP set.
+
+The cache is per process (like the resident index). Hit/miss counters are
+exported as `autoresq_answer_cache_total{result=...}` for threshold tuning.
+"""
+
+import os, time, logging, threading
+from collections import OrderedDict
+import numpy as np
+from app.utils import metrics
+
+log = logging.getLogger("AutoResQ-RAG")
+
+ANSWER_CACHE = os.getenv("RAG_ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("RAG_ANSWER_CACHE_TTL_SECONDS", 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", 1000))
+
+
+def _unit(vec) -> np.ndarray:
+    vec = np.asarray(vec, dtype="float32")
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of (alert vector → answer, source), bound to an index version."""
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (vector, answer, source, created_at)
+        self._matrix = None            # stacked vectors of _entries, rebuilt lazily
+        self._keys = []
+        self._version = None
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                log.info(f"♻️ Answer cache cleared ({len(self._entries)} entries) for index version {version}")
+                metrics.inc("autoresq_answer_cache_invalidations_total")
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def lookup(self, vector, version):
+        """(answer, source, similarity) for the closest fresh entry, or None."""
+        vec = _unit(vector)
+        with self._lock:
+            self._check_version(version)
+            now = time.time()
+            for key in [k for k, e in self._entries.items() if now - e[3] > self.ttl]:
+                del self._entries[key]
+                self._matrix = None
+            if self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[k][0] for k in self._keys])
+                sims = self._matrix @ vec
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = self._keys[best]
+                    self._entries.move_to_end(key)
+                    _, answer, source, _ = self._entries[key]
+                    self.hits += 1
+                    metrics.inc("autoresq_answer_cache_total", result="hit")
+                    return answer, source, float(sims[best])
+            self.misses += 1
+        metrics.inc("autoresq_answer_cache_total", result="miss")
+        return None
+
+    def store(self, vector, answer: str, source: str, version):
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_key] = (_unit(vector), answer, source, time.time())
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+_cache = SemanticAnswerCache()
+metrics.register_gauge("autoresq_answer_cache_entries", lambda: len(_cache._entries),
+                       help="Entries in the semantic answer cache")
+metrics.register_gauge("autoresq_answer_cache_hit_rate", lambda: _cache.stats()["hit_rate"],
+                       help="Semantic answer cache hit rate since process start")
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    return _cache
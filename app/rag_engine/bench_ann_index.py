@@ -0,0 +1,86 @@
+"""
+AutoResQ RAG - bench_ann_index.py
+---------------------------------
+Recall / latency benchmark of the ANN index types in ann_index.py against the
+exact flat index.
+
+Reports, per index type: build time, recall@k vs. flat, and p50/p99 latency
+of single-query searches (the alert-time access pattern).
+
+Run from the repo root:
+    python -m app.rag_engine.bench_ann_index                      # vectors from INDEX_PATH
+    python -m app.rag_engine.bench_ann_index --synthetic 200000   # random corpus
+"""
+
+import os, time, argparse
+import numpy as np
+import faiss
+from app.rag_engine.ann_index import INDEX_TYPES, build_ann_index, flat_vectors
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.synthetic:
+        rng = np.random.default_rng(42)
+        # Clustered data is closer to real embeddings than uniform noise
+        centers = rng.normal(size=(max(1, args.synthetic // 500), args.dim)).astype("float32")
+        labels = rng.integers(0, len(centers), args.synthetic)
+        return centers[labels] + 0.3 * rng.normal(size=(args.synthetic, args.dim)).astype("float32")
+    index = faiss.read_index(os.path.join(args.index_path, "index.faiss"))
+    return flat_vectors(index)
+
+
+def make_queries(vectors: np.ndarray, count: int) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    picked = vectors[rng.choice(len(vectors), min(count, len(vectors)), replace=False)]
+    noise = rng.normal(scale=picked.std() * 0.1, size=picked.shape).astype("float32")
+    return np.ascontiguousarray(picked + noise, dtype="float32")
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    latencies, ids = [], []
+    for q in queries:
+        started = time.perf_counter()
+        _, found = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids.append(found[0])
+    return np.array(ids), np.array(latencies)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-path", default=os.getenv("INDEX_PATH", "faiss_index_openai"))
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark N random vectors instead")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_vectors(args), dtype="float32")
+    queries = make_queries(vectors, args.queries)
+    print(f"corpus={len(vectors)} dim={vectors.shape[1]} queries={len(queries)} k={args.k}\n")
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    truth, flat_lat = timed_search(flat, queries, args.k)
+
+    print(f"{'type':<10} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p99_ms':>8}")
+    print(f"{'flat':<10} {0.0:>8.2f} {1.0:>9.3f} {np.percentile(flat_lat, 50):>8.3f} {np.percentile(flat_lat, 99):>8.3f}")
+    for kind in INDEX_TYPES[1:]:
+        started = time.perf_counter()
+        index = build_ann_index(vectors, kind)
+        build_s = time.perf_counter() - started
+        if index is None:
+            print(f"{kind:<10} {'(corpus too small to train)':>36}")
+            continue
+        found, lat = timed_search(index, queries, args.k)
+        print(f"{kind:<10} {build_s:>8.2f} {recall_at_k(found, truth):>9.3f} "
+              f"{np.percentile(lat, 50):>8.3f} {np.percentile(lat, 99):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
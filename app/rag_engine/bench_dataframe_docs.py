@@ -0,0 +1,91 @@
+"""
+AutoResQ RAG - bench_dataframe_docs.py
+--------------------------------------
+Benchmarks the vectorized `dataframe_to_docs` against the original
+row-by-row `df.iterrows()` implementation on a synthetic Sumo-style export
+(real dtypes, not cast to object), and checks the text is identical on a
+set of edge cases (datetimes, all-numeric, tz, bool, timedelta, empty).
+
+Run from the repo root:  python -m app.rag_engine.bench_dataframe_docs [rows]
+"""
+
+import io, sys, time, logging
+import numpy as np
+import pandas as pd
+from langchain.schema import Document
+from app.rag_engine.embeddings_faiss import dataframe_to_docs
+
+log = logging.getLogger("AutoResQ-Bench")
+
+
+def dataframe_to_docs_iterrows(df: pd.DataFrame, source_path: str):
+    """Original implementation, kept as the baseline."""
+    docs = []
+    for i, row in df.iterrows():
+        content = " | ".join(f"{k}={v}" for k, v in row.items() if pd.notna(v) and str(v).strip())
+        docs.append(Document(page_content=content, metadata={"source": source_path, "row": i}))
+    return docs
+
+
+def make_sumo_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Mixed dtypes as read_csv/read_excel give them (datetime, int, float, str, missing)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "_messagetime": pd.date_range("2025-01-01", periods=rows, freq="s"),
+        "_sourcehost": rng.choice(["mule-node-1", "mule-node-2", "wmq-01"], rows),
+        "level": rng.choice(["INFO", "WARN", "ERROR", ""], rows),
+        "queue": rng.choice(["WMQ_IN", "WMQ_OUT", None], rows),
+        "message": rng.choice(["CPU usage > 90%", "Queue depth high", "ReadTimeout", "   "], rows),
+        "latency_ms": rng.integers(1, 5000, rows),
+        "cpu": np.where(rng.random(rows) < 0.1, np.nan, rng.random(rows).round(3)),
+    })
+
+
+def parity_frames(rows: int = 200):
+    """Edge cases for the iterrows() parity check."""
+    sumo = make_sumo_frame(rows)
+    yield "sumo", sumo
+    yield "as_object", sumo.astype(object)
+    yield "csv_str", sumo.astype(str)
+    yield "numeric_only", sumo[["latency_ms", "cpu"]]
+    yield "dates_midnight", pd.DataFrame({"day": pd.date_range("2025-01-01", periods=rows, freq="D"),
+                                          "n": range(rows)})
+    yield "dates_only", pd.DataFrame({"day": pd.date_range("2025-01-01", periods=rows, freq="D")})
+    yield "tz_bool_delta", pd.DataFrame({"at": pd.date_range("2025-01-01", periods=rows, freq="h", tz="UTC"),
+                                         "ok": [i % 2 == 0 for i in range(rows)],
+                                         "took": pd.to_timedelta(range(rows), unit="s")})
+    yield "empty", pd.DataFrame(columns=sumo.columns)
+    yield "header_only_csv", pd.read_csv(io.StringIO(",".join(sumo.columns) + "\n"), dtype=str)
+    yield "no_columns", pd.DataFrame(index=range(3))
+
+
+def _same(old_docs, new_docs) -> bool:
+    return len(old_docs) == len(new_docs) and all(
+        a.page_content == b.page_content and a.metadata == b.metadata for a, b in zip(old_docs, new_docs)
+    )
+
+
+def _time(fn, df):
+    started = time.perf_counter()
+    docs = fn(df, "bench.csv")
+    return docs, time.perf_counter() - started
+
+
+def main(rows: int = 100_000):
+    logging.getLogger("AutoResQ-RAG").setLevel(logging.WARNING)
+    df = make_sumo_frame(rows)
+    old_docs, old_s = _time(dataframe_to_docs_iterrows, df)
+    new_docs, new_s = _time(dataframe_to_docs, df)
+
+    same = _same(old_docs, new_docs)
+    mismatched = [name for name, frame in parity_frames()
+                  if not _same(dataframe_to_docs_iterrows(frame, "p.csv"), dataframe_to_docs(frame, "p.csv"))]
+    print(f"rows={rows}")
+    print(f"iterrows   : {old_s:8.3f}s  ({rows / old_s:,.0f} rows/s)")
+    print(f"vectorized : {new_s:8.3f}s  ({rows / new_s:,.0f} rows/s)")
+    print(f"speedup    : {old_s / new_s:.1f}x   identical_output={same}")
+    print(f"parity     : {'all identical' if not mismatched else 'MISMATCH in ' + ', '.join(mismatched)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
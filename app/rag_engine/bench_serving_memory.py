@@ -0,0 +1,91 @@
+"""
+AutoResQ RAG - bench_serving_memory.py
+--------------------------------------
+Checks that serving workers share the index vectors instead of each holding
+a private copy.
+
+A scratch index (flat, plus any ANN type given) is opened in fresh worker
+processes with each set of faiss IO flags. After a search touches every
+vector, the script reports each worker's private (RssAnon) and file-backed
+(RssFile, shared page cache) memory growth. It fails if the serving flags
+(serving_store.mmap_flags()) copy more than 10% of the index into private
+memory. Linux only (/proc/self/status).
+
+Run from the repo root:
+    python -m app.rag_engine.bench_serving_memory [--vectors 200000] [--dim 256] [--types flat,hnsw]
+"""
+
+import os, sys, argparse, tempfile, multiprocessing
+import numpy as np
+import faiss
+from app.rag_engine.ann_index import build_ann_index
+from app.rag_engine.serving_store import mmap_flags
+
+FLAG_SETS = {
+    "in-memory": 0,
+    "MMAP|READ_ONLY": faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+    "serving (mmap_flags)": mmap_flags(),
+}
+MAX_PRIVATE_SHARE = 0.10
+
+
+def _rss_mb() -> dict:
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f if line.startswith("Rss"))
+    return {key: int(value.split()[0]) / 1024 for key, value in fields.items()}
+
+
+def _open_and_search(path: str, flags: int, dim: int, result):
+    before = _rss_mb()
+    index = faiss.read_index(path, flags)
+    index.search(np.zeros((1, dim), dtype="float32"), 5)
+    after = _rss_mb()
+    result.put({key: after[key] - before[key] for key in ("RssAnon", "RssFile")})
+
+
+def measure(path: str, flags: int, dim: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")  # a clean interpreter per measurement
+    result = ctx.Queue()
+    worker = ctx.Process(target=_open_and_search, args=(path, flags, dim, result))
+    worker.start()
+    growth = result.get(timeout=600)
+    worker.join()
+    return growth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--types", default="flat", help="comma-separated: flat and/or ann_index types")
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(42).random((args.vectors, args.dim), dtype="float32")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"vectors={args.vectors} dim={args.dim}\n")
+        print(f"{'type':<8} {'flags':<22} {'file_mb':>8} {'private_mb':>11} {'shared_mb':>10}")
+        for kind in args.types.split(","):
+            if kind == "flat":
+                index = faiss.IndexFlatL2(args.dim)
+                index.add(vectors)
+            else:
+                index = build_ann_index(vectors, kind)
+            if index is None:
+                print(f"{kind:<8} (corpus too small to train)")
+                continue
+            path = os.path.join(tmp, f"{kind}.faiss")
+            faiss.write_index(index, path)
+            del index
+            size_mb = os.path.getsize(path) / 2 ** 20
+            for label, flags in FLAG_SETS.items():
+                growth = measure(path, flags, args.dim)
+                print(f"{kind:<8} {label:<22} {size_mb:>8.0f} {growth['RssAnon']:>11.0f} {growth['RssFile']:>10.0f}")
+                if flags == FLAG_SETS["serving (mmap_flags)"] and growth["RssAnon"] > MAX_PRIVATE_SHARE * size_mb:
+                    failed = True
+    print("\nshared page cache: " + ("FAIL, serving flags copy the vectors per worker" if failed else "OK"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+AutoResQ RAG - context_builder.py
+---------------------------------
+Token-budgeted context assembly for the RAG prompt.
+
+Instead of concatenating every top-k chunk in full, the builder:
+1. drops chunks whose retrieval score fails the cutoff
+   (RAG_CONTEXT_SCORE_CUTOFF, default: the relevance threshold);
+2. merges overlapping neighbours — consecutive chunks of one source share
+   RAG_CHUNK_OVERLAP characters — and drops duplicates;
+3. keeps only the sentences/lines that share terms with the alert (plus each
+   chunk's heading line), in their original order;
+4. fills the prompt up to RAG_CONTEXT_TOKEN_BUDGET tokens of the configured
+   LLM model, best-scoring chunks first.
+
+The result carries its token count and the budget so callers can log them.
+"""
+
+import os, re, logging
+from collections import namedtuple
+from functools import lru_cache
+from app.rag_engine.embedding_pipeline import token_counter
+
+log = logging.getLogger("AutoResQ-RAG")
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", 1200))
+CONTEXT_SCORE_CUTOFF = os.getenv("RAG_CONTEXT_SCORE_CUTOFF")  # unset → relevance threshold
+MIN_OVERLAP = 20
+MAX_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", 80)) * 2
+
+BuiltContext = namedtuple("BuiltContext", "text tokens budget sources chunks_used chunks_dropped")
+
+_STOPWORDS = frozenset(
+    "the and for are was were with from this that into onto over under than then when what which while "
+    "have has had not but all any can could should would will may might been being its our your their "
+    "there here about after before alert error errors issue failed failure".split()
+)
+_SENTENCE_SPLIT = re.compile(r"(?<=[^\d\s][.!?])\s+(?=[A-Z0-9])|\n+")  # not after "1." step numbers
+_WORD = re.compile(r"[a-z][a-z0-9_]{2,}")
+
+
+@lru_cache(maxsize=8)
+def count_tokens_for(model: str = None):
+    """Cached token counter for the model (tiktoken, or a chars/4 estimate)."""
+    return token_counter(model)
+
+
+def _terms(text: str) -> set:
+    """Content words, reduced to a 5-char stem so 'restart'/'restarting' match."""
+    return {w[:5] for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def _merge_overlap(a: str, b: str):
+    """a + b when b starts with a suffix of a (splitter overlap), else None."""
+    limit = min(MAX_OVERLAP, len(a), len(b))
+    for size in range(limit, MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:size]):
+            return a + b[size:]
+    return None
+
+
+def merge_neighbours(chunks):
+    """[(text, source, score)] → same, with duplicates removed and overlapping chunks of one source joined."""
+    merged = []
+    for text, source, score in chunks:
+        for i, (m_text, m_source, m_score) in enumerate(merged):
+            if m_source != source:
+                continue
+            if text in m_text:
+                break
+            if m_text in text:
+                joined = text
+            else:
+                joined = _merge_overlap(m_text, text) or _merge_overlap(text, m_text)
+            if joined:
+                merged[i] = (joined, m_source, m_score)
+                break
+        else:
+            merged.append((text, source, score))
+    return merged
+
+
+def extract_relevant(text: str, query_terms: set) -> str:
+    """Heading line + sentences sharing terms with the query, in original order."""
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+    if not sentences or not query_terms:
+        return text.strip()
+    keep = {0}  # heading / first line gives the section context
+    for i, sentence in enumerate(sentences):
+        if _terms(sentence) & query_terms:
+            keep.add(i)
+            # numbered steps usually continue on the next line
+            if i + 1 < len(sentences) and re.match(r"^(\d+[.)]|[-*•])\s", sentences[i + 1]):
+                keep.add(i + 1)
+    if len(keep) == 1:
+        return text.strip()  # nothing matched: keep the chunk rather than just its heading
+    return "\n".join(sentences[i] for i in sorted(keep))
+
+
+def build_context(query: str, results, keep_score, budget: int = CONTEXT_TOKEN_BUDGET, model: str = None) -> BuiltContext:
+    """Assemble the prompt context from [(Document, score)] within `budget` tokens.
+
+    keep_score(score) → bool decides which retrieval scores pass the cutoff.
+    """
+    count = count_tokens_for(model)
+    candidates = [
+        (doc.page_content.strip(), doc.metadata.get("source", "N/A"), score)
+        for doc, score in results
+        if doc.page_content.strip() and keep_score(score)
+    ]
+    below_cutoff = len(results) - len(candidates)
+    merged = merge_neighbours(candidates)
+
+    query_terms = _terms(query)
+    parts, sources, used = [], [], 0
+    for text, source, _ in merged:
+        excerpt = extract_relevant(text, query_terms)
+        tokens = count(excerpt)
+        if used + tokens > budget:
+            # fit the leading sentences of this excerpt into what is left, then stop
+            kept = []
+            for line in excerpt.splitlines():
+                if used + count("\n".join(kept + [line])) > budget:
+                    break
+                kept.append(line)
+            if kept:
+                parts.append("\n".join(kept))
+                sources.append(source)
+            break
+        parts.append(excerpt)
+        sources.append(source)
+        used += tokens
+    sources = list(dict.fromkeys(sources))
+
+    text = "\n\n".join(parts)
+    dropped = below_cutoff + len(merged) - len(parts)
+    return BuiltContext(text, count(text) if text else 0, budget, sources, len(parts), dropped)
+
+
+def score_cutoff(default: float) -> float:
+    return float(CONTEXT_SCORE_CUTOFF) if CONTEXT_SCORE_CUTOFF else default
@@ -0,0 +1,199 @@
+"""
+AutoResQ RAG - embedding_cache.py
+---------------------------------
+Persistent, content-addressed embedding cache.
+
+- Vectors are keyed by (embed model, sha256 of the text) and stored as packed
+  float32 BLOBs in SQLite, so re-indexing an unchanged corpus and repeated
+  alert summaries never hit the embedding endpoint twice.
+- A small in-memory LRU sits in front of SQLite for the query hot path.
+- The on-disk table is bounded by RAG_EMBED_CACHE_MAX_ENTRIES (LRU eviction
+  on `last_used`).
+"""
+
+import os, time, sqlite3, hashlib, logging, threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+
+log = logging.getLogger("AutoResQ-RAG")
+
+EMBED_CACHE_PATH = os.getenv("RAG_EMBED_CACHE_PATH", "embedding_cache.sqlite")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBED_CACHE_MAX_ENTRIES", 200000))
+EMBED_CACHE_MEMORY_ENTRIES = int(os.getenv("RAG_EMBED_CACHE_MEMORY_ENTRIES", 2048))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+  model TEXT NOT NULL,
+  text_hash TEXT NOT NULL,
+  dim INTEGER NOT NULL,
+  vector BLOB NOT NULL,
+  last_used REAL NOT NULL,
+  PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used);
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    """SQLite-backed float32 embedding store with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+                 memory_entries: int = EMBED_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    # ---------------------------------------------------------------
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors (None for misses) in the order of texts."""
+        keys = [text_hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get((model, key))
+                if vec is not None:
+                    self._memory.move_to_end((model, key))
+                    found[key] = vec
+
+            pending = list({k for k in keys if k not in found})
+            now = time.time()
+            for i in range(0, len(pending), 500):
+                part = pending[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model=? AND text_hash IN ({marks})",
+                    (model, *part),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _unpack(blob)
+                    self._remember(model, key, found[key])
+                if rows:
+                    with self._conn:
+                        self._conn.executemany(
+                            "UPDATE embeddings SET last_used=? WHERE model=? AND text_hash=?",
+                            [(now, model, key) for key, _ in rows],
+                        )
+
+            result = [found.get(k) for k in keys]
+            hit_count = sum(v is not None for v in result)
+            self.hits += hit_count
+            self.misses += len(result) - hit_count
+        return result
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                key = text_hash(text)
+                self._remember(model, key, list(vec))
+                rows.append((model, key, len(vec), _pack(vec), now))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": entries,
+            }
+
+    # ---------------------------------------------------------------
+    def _remember(self, model, key, vec):
+        self._memory[(model, key)] = vec
+        self._memory.move_to_end((model, key))
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE (model, text_hash) IN "
+                    "(SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            log.debug(f"Embedding cache evicted {overflow} entries")
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that only embeds texts missing from the cache."""
+
+    def __init__(self, underlying: Embeddings, model: str, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.model = model or "default"
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = self.underlying.embed_documents(missing)
+            self.cache.put_many(self.model, missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+        log.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} embedded")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vec = self.cache.get_many(self.model, [text])[0]
+        if vec is None:
+            vec = self.underlying.embed_query(text)
+            self.cache.put_many(self.model, [text], [vec])
+        return vec
+
+
+# -------------------------------------------------------------------
+# Shared cache (one SQLite connection per process)
+# -------------------------------------------------------------------
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+def cached_embeddings(underlying: Embeddings, model: str) -> CachedEmbeddings:
+    """Wrap an embeddings client with the shared persistent cache."""
+    return CachedEmbeddings(underlying, model, get_embedding_cache())
@@ -0,0 +1,197 @@
+"""
+AutoResQ RAG - embedding_pipeline.py
+------------------------------------
+Batched, concurrent embedding stage with rate-limit-aware backpressure.
+
+- Chunks are grouped into batches by token budget (RAG_EMBED_BATCH_TOKENS)
+  and item count (RAG_EMBED_BATCH_SIZE).
+- Batches are sent concurrently through a bounded worker pool
+  (RAG_EMBED_WORKERS). On HTTP 429 / throttling the allowed concurrency is
+  halved and the batch retried with exponential backoff; it grows back by
+  one slot after a run of successful batches (AIMD).
+- Throughput (chunks/s, tokens/s) is reported after every run.
+
+Works with any LangChain `Embeddings` (embed_documents) and with the
+`get_embedding(text)` providers in `app/llm_providers/*`.
+"""
+
+import os, time, random, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+from langchain_core.embeddings import Embeddings
+
+log = logging.getLogger("AutoResQ-RAG")
+
+EMBED_BATCH_TOKENS = int(os.getenv("RAG_EMBED_BATCH_TOKENS", 20000))
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", 256))
+EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", 4))
+EMBED_MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", 6))
+
+
+# -------------------------------------------------------------------
+# Token counting
+# -------------------------------------------------------------------
+def token_counter(model: str = None) -> Callable[[str], int]:
+    """tiktoken-based counter for the model, or a ~4 chars/token estimate."""
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            enc = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(enc.encode(text, disallowed_special=()))
+    except Exception:
+        return lambda text: max(1, len(text) // 4)
+
+
+def make_batches(texts: List[str], token_counts: List[int], max_tokens: int, max_items: int):
+    """Greedy grouping of text indexes into batches under both budgets."""
+    batches, current, current_tokens = [], [], 0
+    for i, n in enumerate(token_counts):
+        if current and (current_tokens + n > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    """True for 429s / throttling errors from OpenAI, Bedrock or plain HTTP clients."""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    name = type(exc).__name__
+    text = str(exc).lower()
+    return name in ("RateLimitError", "ThrottlingException") or "rate limit" in text or "429" in text
+
+
+# -------------------------------------------------------------------
+# Adaptive concurrency limiter (AIMD)
+# -------------------------------------------------------------------
+class _AdaptiveLimiter:
+    def __init__(self, max_limit: int, recover_after: int = 5):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.recover_after = recover_after
+        self._active = 0
+        self._streak = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._streak += 1
+            if self._streak >= self.recover_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._streak = 0
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self._streak = 0
+            self.limit = max(1, self.limit // 2)
+
+
+# -------------------------------------------------------------------
+# Batch embedder
+# -------------------------------------------------------------------
+class BatchEmbedder:
+    """Embed many texts through a bounded, rate-limit-aware worker pool."""
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], model: str = None,
+                 max_batch_tokens: int = EMBED_BATCH_TOKENS, max_batch_size: int = EMBED_BATCH_SIZE,
+                 max_workers: int = EMBED_WORKERS, max_retries: int = EMBED_MAX_RETRIES):
+        self.embed_fn = embed_fn
+        self.count_tokens = token_counter(model)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.last_stats = {}
+
+    @classmethod
+    def from_provider(cls, provider, **kwargs):
+        """Wrap a LangChain Embeddings or an app.llm_providers provider."""
+        if hasattr(provider, "embed_documents"):
+            return cls(provider.embed_documents, **kwargs)
+        return cls(lambda texts: [provider.get_embedding(t) for t in texts], **kwargs)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        token_counts = [self.count_tokens(t) for t in texts]
+        batches = make_batches(texts, token_counts, self.max_batch_tokens, self.max_batch_size)
+        limiter = _AdaptiveLimiter(min(self.max_workers, len(batches)))
+        retries = [0]
+
+        def run(batch):
+            payload = [texts[i] for i in batch]
+            for attempt in range(self.max_retries + 1):
+                with limiter:
+                    try:
+                        vectors = self.embed_fn(payload)
+                        limiter.on_success()
+                        return vectors
+                    except Exception as e:
+                        if not is_rate_limited(e) or attempt == self.max_retries:
+                            raise
+                        limiter.on_throttle()
+                        retries[0] += 1
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                log.warning(f"⏳ Embedding rate-limited; concurrency={limiter.limit}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        results: List[List[float]] = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix="embed") as pool:
+            for batch, vectors in zip(batches, pool.map(run, batches)):
+                for i, vec in zip(batch, vectors):
+                    results[i] = vec
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        tokens = sum(token_counts)
+        self.last_stats = {
+            "chunks": len(texts),
+            "tokens": tokens,
+            "batches": len(batches),
+            "retries": retries[0],
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(len(texts) / elapsed, 1),
+            "tokens_per_s": round(tokens / elapsed, 1),
+        }
+        log.info(
+            f"⚡ Embedded {len(texts)} chunks in {len(batches)} batches "
+            f"({self.last_stats['chunks_per_s']} chunks/s, {self.last_stats['tokens_per_s']} tokens/s, "
+            f"retries={retries[0]})"
+        )
+        return results
+
+
+class PipelineEmbeddings(Embeddings):
+    """LangChain Embeddings that routes embed_documents through a BatchEmbedder."""
+
+    def __init__(self, underlying, model: str = None, **kwargs):
+        self.underlying = underlying
+        self.embedder = BatchEmbedder.from_provider(underlying, model=model, **kwargs)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedder.embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if hasattr(self.underlying, "embed_query"):
+            return self.underlying.embed_query(text)
+        return self.underlying.get_embedding(text)
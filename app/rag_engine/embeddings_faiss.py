@@ -8,33 +8,57 @@ This script builds and updates the FAISS index for AutoResQ RAG engine.
 
 It performs the following steps:
 1. Loads documents from the data directory (supports txt, pdf, csv, xlsx, zip).
-2. Splits documents into chunks.
-3. Creates embeddings using OpenAI's embedding model.
-4. Builds or appends to a FAISS index and saves it locally.
+2. Splits documents into chunks. Ingestion is a streaming pipeline:
+   file → pages/rows → chunks → embedding batches → index append. Small files
+   are parsed in a process pool of RAG_LOAD_WORKERS; large files are streamed
+   lazily so peak memory is bounded by the batch size (text files are read
+   in RAG_TEXT_BLOCK_CHARS blocks; .xlsx workbooks are still parsed whole, so
+   export very large sheets to CSV). Progress is checkpointed to a separate
+   INDEX_PATH.checkpoint directory, so an interrupted build resumes where it
+   stopped while INDEX_PATH keeps serving the last published index.
+3. Creates embeddings through the LLM_PROVIDER registry (cached on disk by
+   model + sha256 of the chunk text, so unchanged chunks are never re-embedded;
+   misses go through the batched, concurrent embedding_pipeline.py).
+4. Builds or incrementally updates a FAISS index and saves it locally.
+   A per-source manifest (index_manifest.py) records size/mtime/sha256 and
+   vector ids, so unchanged files are skipped, changed files replace their
+   old vectors and deleted files are purged.
+5. Optionally (RAG_SOP_SUMMARIES=1) stores an LLM step summary next to each
+   new or changed SOP chunk (sop_summaries.py) for zero-LLM answers.
+6. Optionally builds an IVF-Flat / HNSW / IVF-PQ serving index from the
+   exact vectors (RAG_INDEX_TYPE, see ann_index.py).
+7. Saves the vectors with a compact, zlib-compressed SQLite docstore
+   (serving_store.py) instead of a pickle, then publishes a new version
+   stamp so running servers hot-reload the index.
+
+Run from the repo root:  python -m app.rag_engine.embeddings_faiss
 
 Logging Levels:
 ---------------
 - INFO  → Flow tracking and summary-level events.
 - DEBUG → Detailed diagnostic trace (counts, filenames, intermediate states).
-
-Note:
------
-No logic, structure, or variable naming has been modified — only descriptive
-comments and loggers are added for clarity and traceability.
 ===============================================================================
 """
 
 # -------------------------------------------------------------------
 # Imports
 # -------------------------------------------------------------------
-import os, logging, tempfile, zipfile, pandas as pd
+import os, time, uuid, shutil, logging, tempfile, zipfile, itertools, numpy as np, pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from langchain_community.document_loaders import (
-    TextLoader, CSVLoader, PyPDFLoader, UnstructuredExcelLoader
+from langchain_community.document_loaders import CSVLoader, PyPDFLoader, UnstructuredExcelLoader
+from app.rag_engine.index_store import save_index
+from app.rag_engine.embedding_cache import cached_embeddings, text_hash
+from app.rag_engine.embedding_pipeline import PipelineEmbeddings
+from app.rag_engine.sop_summaries import SOP_SUMMARIES, attach_summaries
+from app.llm_providers.registry import get_provider
+from app.rag_engine.serving_store import open_index
+from app.rag_engine.ann_index import ANN_FILE, INDEX_TYPE, build_ann_index, flat_vectors, serialize_ann
+from app.rag_engine.index_manifest import (
+    MANIFEST_FILE, load_manifest, dump_manifest, source_key, file_fingerprint, diff_sources
 )
 
 # -------------------------------------------------------------------
@@ -50,125 +74,459 @@ log = logging.getLogger("AutoResQ-RAG")
 # -------------------------------------------------------------------
 # Environment & Configuration
 # -------------------------------------------------------------------
-INDEX_PATH = "faiss_index_openai"
+INDEX_PATH = os.getenv("INDEX_PATH", "faiss_index_openai")
+CHECKPOINT_PATH = INDEX_PATH.rstrip(os.sep) + ".checkpoint"  # unpublished build state, never served
 RAG_DATA_DIR = os.getenv("RAG_DATA_DIR1", os.path.join(os.path.dirname(__file__), "data"))
-EMBED_MODEL = os.getenv("EMBED_MODEL")
 CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", 2000))
 CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", 80))
+LOAD_WORKERS = int(os.getenv("RAG_LOAD_WORKERS", os.cpu_count() or 1))
+INDEX_FLUSH_CHUNKS = int(os.getenv("RAG_INDEX_FLUSH_CHUNKS", 1024))
+CHECKPOINT_CHUNKS = int(os.getenv("RAG_CHECKPOINT_CHUNKS", 20000))
+CSV_CHUNK_ROWS = int(os.getenv("RAG_CSV_CHUNK_ROWS", 0))  # >0: CSVs via chunked pandas reads + dataframe_to_docs
+STREAM_FILE_BYTES = int(os.getenv("RAG_STREAM_FILE_BYTES", 64 * 1024 * 1024))
+TEXT_BLOCK_CHARS = int(os.getenv("RAG_TEXT_BLOCK_CHARS", 1024 * 1024))
 SUPPORTED_TEXT = tuple(
     os.getenv("RAG_SUPPORTED_TEXT", ".txt,.md,.xml,.yaml,.yml,.json,.properties,.java").split(",")
 )
 
-log.info(f"📝 EMBED_MODEL {EMBED_MODEL}")
 log.debug(f"Config: INDEX_PATH={INDEX_PATH}, DATA_DIR={RAG_DATA_DIR}, "
-          f"CHUNK_SIZE={CHUNK_SIZE}, CHUNK_OVERLAP={CHUNK_OVERLAP}, "
+          f"CHUNK_SIZE={CHUNK_SIZE}, CHUNK_OVERLAP={CHUNK_OVERLAP}, LOAD_WORKERS={LOAD_WORKERS}, "
           f"SUPPORTED_TEXT={SUPPORTED_TEXT}")
 
 # -------------------------------------------------------------------
-# Initialize OpenAI Embeddings
+# Initialize Embeddings
+# cache (skip known chunks) → batched, concurrent pipeline → LLM_PROVIDER
 # -------------------------------------------------------------------
-embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
+provider = get_provider()
+EMBED_MODEL = provider.embed_model
+log.info(f"📝 EMBED_MODEL {EMBED_MODEL} ({provider.name})")
+embeddings = cached_embeddings(PipelineEmbeddings(provider, model=EMBED_MODEL), EMBED_MODEL)
 splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
 
 # -------------------------------------------------------------------
 # Core functions
 # -------------------------------------------------------------------
+def _rows_as_text(df: pd.DataFrame) -> pd.Series:
+    """Column-wise "k=v | k=v" rendering of every row, skipping NaN/blank cells.
+
+    Cells render as str() of the value df.iterrows() used to box them as:
+    datetimes as full Timestamps ("2025-01-01 00:00:00") and, in all-numeric
+    frames, every column upcast to the common dtype (1 → "1.0").
+    """
+    dtypes = set(df.dtypes)
+    if len(dtypes) > 1 and all(isinstance(t, np.dtype) and t.kind in "iuf" for t in dtypes):
+        df = df.astype(np.result_type(*dtypes))
+    text = pd.Series("", index=df.index, dtype=object)
+    if df.empty:  # no rows (header-only CSV) or no columns: nothing to join, and str ops fail on it
+        return text
+    for col in df.columns:
+        values = df[col]
+        if values.dtype.kind in "mM" or isinstance(values.dtype, pd.DatetimeTZDtype):
+            as_str = values.map(str)  # Timestamp / Timedelta, not the date-only astype(str) form
+        else:
+            as_str = values.astype(str)
+        keep = values.notna() & as_str.str.strip().ne("")
+        sep = text.ne("").map({True: " | ", False: ""})
+        text = text.where(~keep, text + sep + f"{col}=" + as_str)
+    return text
+
+
 def dataframe_to_docs(df: pd.DataFrame, source_path: str):
     """Convert a DataFrame (e.g. Sumo CSV) into LangChain Documents."""
-    docs = []
-    for i, row in df.iterrows():
-        content = " | ".join(f"{k}={v}" for k, v in row.items() if pd.notna(v) and str(v).strip())
-        docs.append(Document(page_content=content, metadata={"source": source_path, "row": i}))
+    docs = [
+        Document(page_content=content, metadata={"source": source_path, "row": i})
+        for i, content in zip(df.index, _rows_as_text(df))
+    ]
     log.info(f"📝 Converted {len(docs)} DataFrame rows into Documents")
     log.debug(f"DataFrame {source_path} → {len(docs)} docs")
     return docs
 
 
-def load_from_path(path):
-    """Load supported file types as LangChain Documents."""
+def csv_to_docs(path: str, chunk_rows: int = CSV_CHUNK_ROWS):
+    """Stream a large CSV as Documents, chunk_rows rows at a time."""
+    for frame in pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=True):
+        yield from dataframe_to_docs(frame, path)
+
+
+def text_to_docs(path: str, block_chars: int = TEXT_BLOCK_CHARS):
+    """Stream a text file as Documents of ~block_chars characters, cut at line ends.
+
+    Files smaller than one block give the same single Document TextLoader did.
+    """
+    with open(path) as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                break
+            # finish the current line (bounded, in case the file has none)
+            yield Document(page_content=block + f.readline(block_chars), metadata={"source": path})
+
+
+def _loader_for(path):
+    if path.endswith(".csv"):
+        return CSVLoader(path)
+    elif path.endswith(".pdf"):
+        return PyPDFLoader(path)
+    elif path.endswith(".xlsx"):
+        return UnstructuredExcelLoader(path, mode="elements")
+    return None
+
+
+def iter_path_docs(path, strict=False):
+    """Lazily yield raw Documents (pages / rows) from one supported file."""
+    if path.endswith(SUPPORTED_TEXT):
+        docs = text_to_docs(path)
+    elif path.endswith(".csv") and CSV_CHUNK_ROWS > 0:
+        docs = csv_to_docs(path, CSV_CHUNK_ROWS)
+    else:
+        loader = _loader_for(path)
+        if loader is None:
+            return
+        docs = loader.lazy_load()
+    count = 0
     try:
-        if path.endswith(SUPPORTED_TEXT):
-            loaded = TextLoader(path).load()
-        elif path.endswith(".csv"):
-            loaded = CSVLoader(path).load()
-        elif path.endswith(".pdf"):
-            loaded = PyPDFLoader(path).load()
-        elif path.endswith(".xlsx"):
-            loaded = UnstructuredExcelLoader(path, mode="elements").load()
-        else:
-            return []
-        log.info(f"📄 Loaded {len(loaded)} docs from {os.path.basename(path)}")
+        for doc in docs:
+            count += 1
+            yield doc
+        log.info(f"📄 Loaded {count} docs from {os.path.basename(path)}")
         log.debug(f"File loaded successfully: {path}")
-        return loaded
     except Exception as e:
+        if strict:
+            raise
         log.warning(f"⚠️ Skipped {path} due to error: {e}")
-        return []
 
 
-def load_docs_from_dir(data_dir):
-    """Scan directory (and ZIPs) and return chunked documents."""
-    docs = []
-    log.info(f"📂 Scanning directory: {data_dir}")
-    for root, _, files in os.walk(data_dir):
-        for fname in files:
-            fpath = os.path.join(root, fname)
-            if fname.endswith(".zip"):
-                log.info(f"📦 Extracting ZIP: {fname}")
+def load_from_path(path, strict=False):
+    """Load supported file types as LangChain Documents (strict=True re-raises parse errors)."""
+    return list(iter_path_docs(path, strict=strict))
+
+
+def iter_source_docs(fpath, strict=False):
+    """Lazily yield raw Documents from one top-level source (ZIPs member by member)."""
+    if not fpath.endswith(".zip"):
+        yield from iter_path_docs(fpath, strict=strict)
+        return
+
+    log.info(f"📦 Extracting ZIP: {os.path.basename(fpath)}")
+    try:
+        with zipfile.ZipFile(fpath, "r") as zf, tempfile.TemporaryDirectory() as extract_dir:
+            for member in zf.infolist():
+                if member.is_dir():
+                    continue
+                # One member on disk at a time keeps temp space and memory bounded
+                subpath = zf.extract(member, extract_dir)
                 try:
-                    with zipfile.ZipFile(fpath, "r") as zf:
-                        extract_dir = tempfile.mkdtemp()
-                        zf.extractall(extract_dir)
-                        for subroot, _, subfiles in os.walk(extract_dir):
-                            for subfile in subfiles:
-                                subpath = os.path.join(subroot, subfile)
-                                docs.extend(load_from_path(subpath))
-                        log.debug(f"Extracted and loaded contents from ZIP: {fname}")
-                except Exception as e:
-                    log.warning(f"⚠️ Failed to extract ZIP {fname}: {e}")
-            else:
-                docs.extend(load_from_path(fpath))
-
-    if docs:
-        chunks = splitter.split_documents(docs)
-        log.info(f"✂️ Split {len(docs)} raw docs into {len(chunks)} chunks")
+                    for d in iter_path_docs(subpath, strict=strict):
+                        # Temp paths are meaningless after extraction; keep "<zip>!<member>"
+                        d.metadata["source"] = f"{source_key(fpath)}!{member.filename}"
+                        yield d
+                finally:
+                    os.remove(subpath)
+            log.debug(f"Extracted and loaded contents from ZIP: {fpath}")
+    except Exception as e:
+        if strict:
+            raise
+        log.warning(f"⚠️ Failed to extract ZIP {fpath}: {e}")
+
+
+def load_source(fpath, strict=False):
+    """Load one top-level source file (ZIPs are expanded) as raw Documents."""
+    return list(iter_source_docs(fpath, strict=strict))
+
+
+def iter_chunks(fpath, strict=False):
+    """Stream chunks of one source: file → pages/rows → chunks."""
+    for doc in iter_source_docs(fpath, strict=strict):
+        yield from splitter.split_documents([doc])
+
+
+def list_source_files(data_dir):
+    """All indexable top-level files (including ZIPs) under data_dir."""
+    paths = []
+    for root, _, files in os.walk(data_dir):
+        for fname in sorted(files):
+            if fname.endswith((*SUPPORTED_TEXT, ".csv", ".pdf", ".xlsx", ".zip")):
+                paths.append(os.path.join(root, fname))
+    return paths
+
+
+def _load_and_split(fpath):
+    """Parse and chunk one source file. Runs inside the loader process pool.
+
+    Returns (path, chunks, seconds, error).
+    """
+    started = time.perf_counter()
+    try:
+        chunks = list(iter_chunks(fpath, strict=True))
+        return fpath, chunks, time.perf_counter() - started, None
+    except Exception as e:
+        return fpath, [], time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def _pool_results(paths, workers):
+    """_load_and_split over a process pool with at most 2×workers files in flight.
+
+    Bounding in-flight files keeps parsed-but-not-yet-embedded chunks from
+    piling up in memory when embedding is slower than parsing.
+    """
+    pending = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = set()
+        try:
+            while True:
+                for path in itertools.islice(pending, max(0, workers * 2 - len(inflight))):
+                    inflight.add(pool.submit(_load_and_split, path))
+                if not inflight:
+                    break
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in inflight:
+                future.cancel()
+
+
+class _ChunkStream:
+    """Iterable over one large source's chunks that records timing and failure."""
+
+    def __init__(self, path, stats):
+        self.path = path
+        self.stats = stats
+        self.failed = False
+
+    def __iter__(self):
+        started, count = time.perf_counter(), 0
+        try:
+            for chunk in iter_chunks(self.path, strict=True):
+                count += 1
+                yield chunk
+        except Exception as e:
+            self.failed = True
+            self.stats["failures"].append((self.path, f"{type(e).__name__}: {e}"))
+            log.warning(f"⚠️ Failed {os.path.basename(self.path)} after {count} chunks: {e}")
+            return
+        self.stats["chunks"] += count
+        log.info(f"⏱️ {os.path.basename(self.path)}: {count} chunks streamed in {time.perf_counter() - started:.2f}s")
+
+
+def iter_source_chunks(paths, workers=LOAD_WORKERS):
+    """Yield (path, chunks) per source file as soon as it is ready.
+
+    Files up to RAG_STREAM_FILE_BYTES are parsed and split in a process pool
+    (workers > 1) and yielded in completion order as chunk lists. Larger
+    files — and all files when workers <= 1 — are yielded as lazy chunk
+    streams, so peak memory is set by the embedding batch size rather than
+    by the file size. Per-file timing and failures are logged, with a
+    summary at the end.
+    """
+    paths = list(paths)
+    started = time.perf_counter()
+    stats = {"chunks": 0, "failures": []}
+
+    if workers > 1 and len(paths) > 1:
+        pooled = [p for p in paths if os.path.getsize(p) <= STREAM_FILE_BYTES]
+        pooled_set = set(pooled)
+        streamed = [p for p in paths if p not in pooled_set]
+        log.info(f"🧵 Loading {len(pooled)} files with {workers} worker processes, streaming {len(streamed)} large files")
+    else:
+        pooled, streamed = [], paths
+
+    for path, chunks, seconds, error in _pool_results(pooled, min(workers, len(pooled) or 1)):
+        if error:
+            stats["failures"].append((path, error))
+            log.warning(f"⚠️ Failed {os.path.basename(path)} after {seconds:.2f}s: {error}")
+            continue
+        stats["chunks"] += len(chunks)
+        log.info(f"⏱️ {os.path.basename(path)}: {len(chunks)} chunks in {seconds:.2f}s")
+        yield path, chunks
+
+    for path in streamed:
+        yield path, _ChunkStream(path, stats)
+
+    failures = stats["failures"]
+    log.info(
+        f"📚 Loaded {len(paths) - len(failures)}/{len(paths)} files → {stats['chunks']} chunks "
+        f"in {time.perf_counter() - started:.2f}s ({len(failures)} failed)"
+    )
+    for path, error in failures:
+        log.debug(f"Load failure: {path}: {error}")
+
+
+def load_docs_from_dir(data_dir, workers=1):
+    """Scan directory (and ZIPs) and return chunked documents.
+
+    Kept for callers that want a list; indexing uses the streaming
+    iter_source_chunks() path instead.
+    """
+    log.info(f"📂 Scanning directory: {data_dir}")
+    chunks = [c for _, file_chunks in iter_source_chunks(list_source_files(data_dir), workers) for c in file_chunks]
+    if chunks:
+        log.info(f"✂️ Split documents into {len(chunks)} chunks")
         log.debug(f"Chunk details: chunk_size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP}")
-        return chunks
     else:
         log.warning("⚠️ No documents found in directory")
-        return []
+    return chunks
+
+
+def _open_index(rebuild_untracked=False):
+    """Load the existing index (if any) together with its manifest.
+
+    An interrupted build's checkpoint takes precedence over the published
+    index, so the build resumes from it.
+    """
+    path = CHECKPOINT_PATH if os.path.exists(os.path.join(CHECKPOINT_PATH, MANIFEST_FILE)) else INDEX_PATH
+    if not os.path.exists(os.path.join(path, "index.faiss")):
+        return None, {}
+    manifest = load_manifest(path)
+    if manifest is None and rebuild_untracked:
+        log.warning("⚠️ Existing FAISS index has no manifest — rebuilding from scratch to drop untracked vectors.")
+        return None, {}
+    if path == CHECKPOINT_PATH:
+        log.info(f"⏩ Resuming interrupted build from {CHECKPOINT_PATH}")
+    db = open_index(path, embeddings, writable=True)
+    return db, manifest or {}
+
+
+def _chunk_id(source, position, text):
+    """Deterministic vector id per (source, chunk position, chunk text)."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{position}#{text_hash(text)}"))
+
+
+def _is_resumable(entry, fp):
+    """A partially indexed source whose content has not changed since the checkpoint."""
+    return bool(entry and entry.get("partial") and entry.get("sha256") == fp.get("sha256"))
+
+
+def _remove_sources(db, manifest, replaced, removed):
+    """Delete vectors of sources that are being replaced or were removed."""
+    stale = [vid for src in (*replaced, *removed) for vid in manifest.get(src, {}).get("ids", [])]
+    if db is not None and stale:
+        live = set(db.index_to_docstore_id.values())
+        stale = [vid for vid in stale if vid in live]
+        if stale:
+            db.delete(stale)
+            log.info(f"🗑️ Removed {len(stale)} stale vectors")
+    for src in removed:
+        manifest.pop(src, None)
+        log.info(f"🗑️ Purged deleted source {src}")
+
+
+def _add_sources(db, manifest, items, flush_chunks=INDEX_FLUSH_CHUNKS, checkpoint_chunks=CHECKPOINT_CHUNKS):
+    """Embed and add chunks per source in batches of flush_chunks.
+
+    items: iterable of (source, chunks, fingerprint); chunks may be a lazy
+    stream. Every checkpoint_chunks chunks the index and manifest are saved
+    to CHECKPOINT_PATH (INDEX_PATH is only written by _publish). A source stays marked "partial" with
+    its chunk position until it is fully added, so an interrupted build
+    resumes where it stopped instead of starting over.
+    """
+    seen, pending_docs, pending_ids = set(), [], []
+    added = since_checkpoint = 0
+
+    def flush(db):
+        if not pending_docs:
+            return db
+        if db is None:
+            log.info(f"📦 Creating new FAISS index at {INDEX_PATH}...")
+            db = FAISS.from_documents(pending_docs, embeddings, ids=pending_ids)
+        else:
+            db.add_documents(pending_docs, ids=pending_ids)
+        pending_docs.clear()
+        pending_ids.clear()
+        return db
+
+    for src, chunks, fp in items:
+        previous = manifest.get(src)
+        if _is_resumable(previous, fp):
+            skip, ids = previous.get("chunks_done", 0), list(previous.get("ids", []))
+            log.info(f"⏩ Resuming {src} after {skip} chunks")
+        else:
+            skip, ids = 0, []
+        entry = manifest[src] = {**fp, "ids": ids, "partial": True, "chunks_done": skip}
+
+        for position, d in enumerate(chunks):
+            if position < skip:
+                continue
+            entry["chunks_done"] = position + 1
+            text = d.page_content.strip()
+            key = text_hash(text)
+            if not text or key in seen:
+                continue
+            seen.add(key)
+            vid = _chunk_id(src, position, d.page_content)
+            ids.append(vid)
+            pending_docs.append(d)
+            pending_ids.append(vid)
+            added += 1
+            if len(pending_docs) >= flush_chunks:
+                since_checkpoint += len(pending_docs)
+                db = flush(db)
+                if since_checkpoint >= checkpoint_chunks:
+                    _checkpoint(db, manifest)
+                    since_checkpoint = 0
+
+        if not getattr(chunks, "failed", False):
+            entry.pop("partial")
+            entry.pop("chunks_done")
+    db = flush(db)
+
+    log.debug(f"Unique documents count: {added}")
+    if db is not None:
+        log.info(f"➕ Added {added} docs (total={len(db.index_to_docstore_id)})")
+    return db
+
+
+def _attach_sop_summaries(db) -> int:
+    """Optional offline pass: step summaries for SOP chunks that do not have one yet."""
+    if not SOP_SUMMARIES or db is None:
+        return 0
+    docs = (db.docstore.search(doc_id) for doc_id in db.index_to_docstore_id.values())
+    return attach_summaries([d for d in docs if not isinstance(d, str)])
+
+
+def _checkpoint(db, manifest):
+    # Never into INDEX_PATH: a half-built index (old vectors of changed sources
+    # already deleted) must not be picked up by a cold start or a crash.
+    save_index(db, CHECKPOINT_PATH, sidecars={MANIFEST_FILE: dump_manifest(manifest)}, publish=False)
+    log.info(f"📍 Checkpoint saved to {CHECKPOINT_PATH} ({len(db.index_to_docstore_id)} vectors)")
+
+
+def _publish(db, manifest):
+    sidecars = {MANIFEST_FILE: dump_manifest(manifest)}
+    ann = build_ann_index(flat_vectors(db.index), INDEX_TYPE)
+    if ann is not None:
+        sidecars[ANN_FILE] = serialize_ann(ann)
+    version = save_index(db, INDEX_PATH, sidecars=sidecars, drop=(ANN_FILE,))
+    shutil.rmtree(CHECKPOINT_PATH, ignore_errors=True)
+    log.info(f"💾 FAISS index saved to {INDEX_PATH} (version={version})")
+    log.info(f"🗃️ Embedding cache: {embeddings.cache.stats()}")
 
 
 def build_faiss_from_docs(docs):
-    """Create or append to FAISS index from docs."""
+    """Create or update FAISS index from docs.
+
+    Docs are grouped by metadata["source"]; vectors previously indexed for the
+    same source are replaced, so re-indexing a file never duplicates it.
+    """
     if not docs:
         log.warning("⚠️ No documents to index.")
         return None
 
     log.info("📦 Building FAISS index...")
-    seen, unique_docs = set(), []
+    updates = {}
     for d in docs:
-        text = d.page_content.strip()
-        if text and text not in seen:
-            seen.add(text)
-            unique_docs.append(d)
-    log.debug(f"Unique documents count: {len(unique_docs)}")
+        src = source_key(d.metadata.get("source", "unknown"))
+        updates.setdefault(src, ([], {}))[0].append(d)
+    for src in updates:
+        if os.path.isfile(src):
+            updates[src] = (updates[src][0], file_fingerprint(src))
 
     try:
-        if os.path.exists(INDEX_PATH):
-            log.info("📦 Appending to existing FAISS index...")
-            db = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-            before = len(db.index_to_docstore_id)
-            db.add_documents(unique_docs)
-            after = len(db.index_to_docstore_id)
-            log.info(f"➕ Added {after - before} docs (total={after})")
-            log.debug(f"Before={before}, After={after}")
-        else:
-            log.info(f"📦 Creating new FAISS index at {INDEX_PATH}...")
-            db = FAISS.from_documents(unique_docs, embeddings)
-            log.info(f"✅ New FAISS index created with {len(unique_docs)} docs")
-
-        db.save_local(INDEX_PATH)
-        log.info(f"💾 FAISS index saved to {INDEX_PATH}")
+        db, manifest = _open_index()
+        _remove_sources(db, manifest, replaced=updates, removed=[])
+        db = _add_sources(db, manifest, ((src, chunks, fp) for src, (chunks, fp) in updates.items()))
+        _attach_sop_summaries(db)
+        _publish(db, manifest)
         return db
 
     except Exception as e:
@@ -176,11 +534,47 @@ def build_faiss_from_docs(docs):
         return None
 
 
+def sync_index(data_dir=RAG_DATA_DIR, workers=LOAD_WORKERS):
+    """Incrementally bring the FAISS index in line with data_dir.
+
+    Unchanged files are skipped, changed files are re-chunked and re-embedded
+    (their old vectors deleted first) and deleted files are purged. Changed
+    files are parsed in a process pool of `workers` (RAG_LOAD_WORKERS).
+    """
+    log.info(f"🔄 Syncing FAISS index with {data_dir}")
+    try:
+        db, manifest = _open_index(rebuild_untracked=True)
+        changed, touched, deleted = diff_sources(manifest, list_source_files(data_dir), root=data_dir)
+        log.info(f"🧾 Manifest diff: {len(changed)} changed/new, {len(touched)} touched, {len(deleted)} deleted")
+        for src, fp in touched.items():
+            manifest[src].update(fp)
+        if db is not None and not changed and not deleted:
+            # a leftover checkpoint already holds every change: publish it
+            if _attach_sop_summaries(db) or touched or os.path.exists(CHECKPOINT_PATH):
+                _publish(db, manifest)
+            log.info("✅ FAISS index already up to date.")
+            return db
+
+        replaced = [src for src, fp in changed.items() if not _is_resumable(manifest.get(src), fp)]
+        _remove_sources(db, manifest, replaced=replaced, removed=deleted)
+        items = ((src, chunks, changed[src]) for src, chunks in iter_source_chunks(changed, workers))
+        db = _add_sources(db, manifest, items)
+        if db is None:
+            log.warning("⚠️ No documents to index.")
+            return None
+        _attach_sop_summaries(db)
+        _publish(db, manifest)
+        return db
+
+    except Exception as e:
+        log.error(f"❌ Error syncing FAISS index: {e}")
+        return None
+
+
 # -------------------------------------------------------------------
 # Script Entry Point
 # -------------------------------------------------------------------
 if __name__ == "__main__":
     log.info("🚀 Starting FAISS index build for AutoResQ...")
-    docs = load_docs_from_dir(RAG_DATA_DIR)
-    build_faiss_from_docs(docs)
+    sync_index(RAG_DATA_DIR)
     log.info("✅ FAISS index build complete.")
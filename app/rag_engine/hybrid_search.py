@@ -0,0 +1,84 @@
+"""
+AutoResQ RAG - hybrid_search.py
+-------------------------------
+Lexical leg and rank fusion for hybrid retrieval (RAG_HYBRID_SEARCH, default on).
+
+Alert summaries carry exact identifiers (`WMQ_IN`, node names, error classes,
+ticket ids) that dense embeddings rank poorly. The builder therefore writes a
+contentless FTS5 index into docstore.sqlite next to the vectors
+(serving_store.py), and `rag_ai_engine.search_faiss_with_score` fuses:
+- the dense FAISS top RAG_HYBRID_CANDIDATES, and
+- the BM25 top RAG_HYBRID_CANDIDATES from FTS5 (local, no network call)
+with reciprocal-rank fusion (RAG_RRF_K, default 60). Each leg goes deeper
+when more results are asked for (RAG_RERANK_CANDIDATES for the reranker).
+
+The dense leg runs under RAG_DENSE_TIMEOUT_SECONDS; if the embedding endpoint
+is slow or down, lexical hits are returned alone.
+"""
+
+import os, re, logging
+from concurrent.futures import ThreadPoolExecutor
+from app.rag_engine.serving_store import CompactDocstore
+
+log = logging.getLogger("AutoResQ-RAG")
+
+HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", 20))
+RRF_K = int(os.getenv("RAG_RRF_K", 60))
+DENSE_TIMEOUT_SECONDS = float(os.getenv("RAG_DENSE_TIMEOUT_SECONDS", 3))
+MAX_QUERY_TERMS = 32
+
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "the and for are was were with from this that into onto over under than then when what which "
+    "while have has had not but all any can on in at of to is it be by an or as".split()
+)
+# WMQ_IN, node01, ORA-00600 → ORA 00600, OutOfMemoryError
+_IDENTIFIER = re.compile(r"\b(?:\w*_\w+|(?=\w*\d)(?=\w*[A-Za-z])\w{3,}|[A-Z][a-z]+(?:[A-Z][a-z0-9]*){2,})\b")
+
+# Shared by all time-bounded embedding calls (the slow leg must not block the caller)
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dense-search")
+
+
+def run_with_timeout(fn, timeout: float = DENSE_TIMEOUT_SECONDS):
+    """fn() on the dense-search pool; raises concurrent.futures.TimeoutError after `timeout`."""
+    return _pool.submit(fn).result(timeout=timeout)
+
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression: OR of the quoted content tokens of text."""
+    terms = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if len(token) > 1 and token not in _STOPWORDS and token not in terms:
+            terms.append(token)
+    return " OR ".join(f'"{t}"' for t in terms[:MAX_QUERY_TERMS])
+
+
+def identifier_terms(text: str) -> set:
+    """Exact identifiers in text (underscores, digit/letter mixes, CamelCase class names), lowercased."""
+    return {m.lower() for m in _IDENTIFIER.findall(text or "")}
+
+
+def lexical_search(db, query: str, k: int = HYBRID_CANDIDATES):
+    """[(Document, bm25)] from the FTS5 index of a compact docstore, best first ([] otherwise)."""
+    match = fts_query(query)
+    if not match or not isinstance(getattr(db, "docstore", None), CompactDocstore):
+        return []
+    return [(doc, rank) for _, _, doc, rank in db.docstore.lexical_search(match, k)]
+
+
+def doc_key(doc):
+    """Identity of a chunk across the two result lists."""
+    return doc.metadata.get("source"), doc.page_content
+
+
+def rrf_fuse(*ranked_lists, k: int = RRF_K):
+    """Reciprocal-rank fusion of [(Document, score)] lists → [Document], best first."""
+    scores, docs = {}, {}
+    for ranked in ranked_lists:
+        for rank, (doc, _) in enumerate(ranked, start=1):
+            key = doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
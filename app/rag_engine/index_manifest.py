@@ -0,0 +1,92 @@
+"""
+AutoResQ RAG - index_manifest.py
+--------------------------------
+Per-source manifest for incremental re-indexing.
+
+manifest.json lives next to index.faiss and records, for every indexed
+source: path, size, mtime, sha256 of the content and the FAISS vector ids
+its chunks were stored under. Sources interrupted mid-build are kept as
+"partial" with the number of chunks already processed, so a rerun resumes. `embeddings_faiss.py` uses it to skip
+unchanged files, replace the vectors of changed files and purge deleted ones.
+"""
+
+import os, json, hashlib, logging
+
+log = logging.getLogger("AutoResQ-RAG")
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def load_manifest(index_path: str):
+    """Return {source: entry} or None if the index has no manifest yet."""
+    try:
+        with open(os.path.join(index_path, MANIFEST_FILE)) as f:
+            data = json.load(f)
+        return data.get("sources", {})
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning(f"⚠️ Unreadable manifest in {index_path}: {e}")
+        return None
+
+
+def dump_manifest(sources: dict) -> str:
+    return json.dumps({"version": MANIFEST_VERSION, "sources": sources}, indent=1, sort_keys=True)
+
+
+def source_key(path: str) -> str:
+    """Stable manifest key for a source path."""
+    return os.path.normpath(os.path.abspath(path)) if os.path.exists(path) else path
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: str, previous: dict = None) -> dict:
+    """size/mtime/sha256 of a file; the hash is reused when size and mtime match."""
+    st = os.stat(path)
+    fp = {"size": st.st_size, "mtime": st.st_mtime}
+    if previous and previous.get("size") == fp["size"] and previous.get("mtime") == fp["mtime"]:
+        fp["sha256"] = previous.get("sha256")
+    else:
+        fp["sha256"] = file_sha256(path)
+    return fp
+
+
+def diff_sources(manifest: dict, paths, root: str = None):
+    """Compare files on disk against the manifest.
+
+    Returns (changed, touched, deleted):
+    - changed: {key: fingerprint} for new, changed or partially indexed files
+    - touched: {key: fingerprint} for files with new size/mtime but same content
+    - deleted: [key] for file sources that are gone (or no longer under root)
+    """
+    changed, touched = {}, {}
+    seen = set()
+    for path in paths:
+        key = source_key(path)
+        seen.add(key)
+        previous = manifest.get(key)
+        fp = file_fingerprint(path, previous)
+        if not previous or previous.get("partial") or previous.get("sha256") != fp["sha256"]:
+            changed[key] = fp
+        elif previous.get("size") != fp["size"] or previous.get("mtime") != fp["mtime"]:
+            touched[key] = fp
+
+    root = source_key(root) if root else None
+    deleted = []
+    for key in manifest:
+        if key in seen:
+            continue
+        base = key.split("!", 1)[0]  # ZIP members are keyed "<zip path>!<member>"
+        if not os.path.isabs(base):
+            continue
+        if not os.path.exists(base) or (root and base.startswith(root + os.sep)):
+            deleted.append(key)
+    return changed, touched, deleted
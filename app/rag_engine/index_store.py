@@ -0,0 +1,165 @@
+"""
+AutoResQ RAG - index_store.py
+-----------------------------
+Process-wide FAISS index handle with hot reload.
+
+- The builder (`embeddings_faiss.py`) publishes a new index with `save_index()`,
+  which writes the FAISS files first and a `version.json` stamp last.
+- The serving side keeps ONE resident index per process (`ResidentIndex`) and
+  only reloads it when the version stamp changes. The new index is loaded on
+  the side and swapped in with a single reference assignment, so in-flight
+  queries keep using the snapshot they started with.
+- Builds are stored as index.faiss + a compact, lazily read SQLite docstore
+  (serving_store.py) instead of a pickle; serving opens the vectors read-only
+  via mmap, so worker processes share page-cache memory.
+- If the build also produced an ANN serving index (ann_index.py), it is
+  swapped in for the exact flat index after loading.
+"""
+
+import os, json, time, shutil, logging, threading, datetime
+
+from app.rag_engine.ann_index import load_ann_index
+from app.rag_engine.serving_store import (
+    DOCSTORE_FILE, INDEX_FILE, LEGACY_PICKLE_FILE, SERVING_MMAP, mmap_flags, open_index, save_store,
+)
+
+log = logging.getLogger("AutoResQ-RAG")
+
+VERSION_FILE = "version.json"
+INDEX_FILES = (INDEX_FILE, DOCSTORE_FILE)
+
+
+# -------------------------------------------------------------------
+# Version stamp helpers
+# -------------------------------------------------------------------
+def write_index_version(index_path: str) -> str:
+    """Write a new version stamp into index_path (atomic rename)."""
+    version = str(time.time_ns())
+    stamp = {"version": version, "built_at": datetime.datetime.utcnow().isoformat()}
+    tmp = os.path.join(index_path, VERSION_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(stamp, f)
+    os.replace(tmp, os.path.join(index_path, VERSION_FILE))
+    log.debug(f"Index version stamp written: {version}")
+    return version
+
+
+def read_index_version(index_path: str):
+    """Return the current index version, or None if no index exists.
+
+    Falls back to the mtime of index.faiss for indexes built before
+    version stamps were introduced.
+    """
+    try:
+        with open(os.path.join(index_path, VERSION_FILE)) as f:
+            return str(json.load(f)["version"])
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        return f"mtime:{os.stat(os.path.join(index_path, INDEX_FILE)).st_mtime_ns}"
+    except OSError:
+        return None
+
+
+def save_index(db, index_path: str, sidecars: dict = None, publish: bool = True, drop=()):
+    """Save a LangChain FAISS store and publish it to readers.
+
+    The index (plus any sidecar files, e.g. the manifest, given as
+    {filename: str | bytes | callable(dest_path)}) is written to a staging directory and moved into place
+    file by file; the version stamp is written last so readers never pick up
+    a build that is still being written. publish=False saves without stamping
+    a version (build checkpoints, written to their own directory, never to the
+    served INDEX_PATH). Files
+    named in `drop` (e.g. an ANN index that no longer applies) and a legacy
+    index.pkl are removed.
+    """
+    staging = index_path.rstrip(os.sep) + ".staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    save_store(db, staging)
+    for name, content in (sidecars or {}).items():
+        if callable(content):
+            content(os.path.join(staging, name))
+            continue
+        with open(os.path.join(staging, name), "wb" if isinstance(content, bytes) else "w") as f:
+            f.write(content)
+    os.makedirs(index_path, exist_ok=True)
+    for name in (*INDEX_FILES, *(sidecars or {})):
+        os.replace(os.path.join(staging, name), os.path.join(index_path, name))
+    for name in (*drop, LEGACY_PICKLE_FILE):
+        if name not in (sidecars or {}) and os.path.exists(os.path.join(index_path, name)):
+            os.remove(os.path.join(index_path, name))
+    shutil.rmtree(staging, ignore_errors=True)
+    return write_index_version(index_path) if publish else None
+
+
+# -------------------------------------------------------------------
+# Resident index
+# -------------------------------------------------------------------
+class ResidentIndex:
+    """Thread-safe, load-once FAISS handle that hot-reloads on new versions."""
+
+    def __init__(self, index_path: str, embeddings_factory, poll_seconds: float = 5.0):
+        self.index_path = index_path
+        self.poll_seconds = poll_seconds
+        self._embeddings_factory = embeddings_factory
+        self._embeddings = None
+        self._reload_lock = threading.Lock()
+        self._state = (None, None)  # (db, version) — swapped as one reference
+        self._last_check = 0.0
+
+    @property
+    def version(self):
+        return self._state[1]
+
+    def get(self):
+        """Return (db, embeddings) for the current index version."""
+        db, _ = self._state
+        if db is not None and time.monotonic() - self._last_check < self.poll_seconds:
+            return db, self._embeddings
+
+        # Only the first load blocks; later reloads happen in one thread while
+        # the others keep serving the previous snapshot.
+        if not self._reload_lock.acquire(blocking=db is None):
+            return db, self._embeddings
+        try:
+            self._refresh()
+        finally:
+            self._reload_lock.release()
+        return self._state[0], self._embeddings
+
+    def _refresh(self):
+        self._last_check = time.monotonic()
+        db, current = self._state
+        version = read_index_version(self.index_path)
+        if version is None:
+            if db is None:
+                log.warning(f"⚠️ FAISS index not found at {self.index_path}")
+            return
+        if version == current:
+            return
+
+        new_db = self._load()
+        if new_db is None:
+            return
+        self._state = (new_db, version)
+        log.info(f"✅ Loaded FAISS index version {version} ({len(new_db.index_to_docstore_id)} docs)")
+
+    def _load(self):
+        try:
+            if self._embeddings is None:
+                self._embeddings = self._embeddings_factory()
+            db = open_index(self.index_path, self._embeddings)
+            if db is None:
+                return None
+        except Exception as e:
+            log.error(f"❌ Failed to load FAISS index: {e}")
+            return None
+        # Guard against picking up the index and docstore from two different builds.
+        if db.index.ntotal != len(db.index_to_docstore_id):
+            log.warning("⚠️ FAISS index and docstore out of sync (build in progress?). Keeping previous index.")
+            return None
+        ann = load_ann_index(self.index_path, db.index, mmap_flags() if SERVING_MMAP else 0)
+        if ann is not None:
+            db.index = ann
+            log.info(f"🧭 Serving {type(ann).__name__} ANN index")
+        return db
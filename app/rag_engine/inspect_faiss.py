@@ -2,12 +2,20 @@
 AutoResQ RAG - inspect_faiss.py
 -------------------------------
 Validates and previews FAISS index contents.
+
+Pages through the compact docstore (serving_store.py) — only the previewed
+chunks are decompressed, so inspecting a large index stays cheap. Legacy
+pickled indexes are still supported.
+
+    python -m app.rag_engine.inspect_faiss [--limit 20] [--after POS] [--source PATH] [--sources]
 """
 
-import os, logging
+import os, logging, argparse
+import faiss
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings  # ✅ Use OpenAI instead of Bedrock
+from app.rag_engine.serving_store import DOCSTORE_FILE, CompactDocstore, mmap_flags
+from app.llm_providers.registry import provider_embeddings
 
 # -------------------------------------------------------------------
 # Setup
@@ -17,10 +25,15 @@ logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 log = logging.getLogger("AutoResQ-Inspect")
 
 INDEX_PATH = os.getenv("INDEX_PATH")
-EMBED_MODEL = os.getenv("EMBED_MODEL")
 
 # -------------------------------------------------------------------
-def inspect_faiss(limit=10):
+def _log_doc(n, pos, doc_id, doc):
+    log.info(f"[{n}] pos={pos} ID={doc_id}")
+    log.info(f"Metadata: {doc.metadata}")
+    log.info(f"Snippet: {doc.page_content[:900].replace(chr(10), ' ')} ...\n")
+
+
+def inspect_faiss(limit=10, after=-1, source=None, list_sources=False):
     if not os.path.exists(INDEX_PATH):
         log.error(f"❌ Index path not found: {INDEX_PATH}")
         return
@@ -30,20 +43,43 @@ def inspect_faiss(limit=10):
         log.error(f"❌ No FAISS index file found at {index_file}")
         return
 
-    embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
-    db = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+    docstore_file = os.path.join(INDEX_PATH, DOCSTORE_FILE)
+    if not os.path.exists(docstore_file):
+        _inspect_legacy(limit)
+        return
+
+    index = faiss.read_index(index_file, mmap_flags())
+    docstore = CompactDocstore(docstore_file)
+    log.info(f"✅ Opened FAISS index from {INDEX_PATH} ({index.ntotal} vectors, dim={index.d})")
+    log.info(f"📦 Total documents: {docstore.count()}\n")
+    if index.ntotal != docstore.count():
+        log.warning("⚠️ Vector count and docstore size differ")
+
+    if list_sources:
+        for src, count in docstore.sources():
+            log.info(f"{count:>8}  {src}")
+        return
+
+    page = docstore.page(after_pos=after, limit=limit, source=source)
+    for i, (pos, doc_id, doc) in enumerate(page):
+        _log_doc(i + 1, pos, doc_id, doc)
+    if len(page) == limit:
+        log.info(f"➡️ Next page: --after {page[-1][0]}")
 
-    total = len(db.index_to_docstore_id)
-    log.info(f"✅ Loaded FAISS index from {INDEX_PATH}")
-    log.info(f"📦 Total documents: {total}\n")
 
-    for i, (doc_id, doc) in enumerate(db.docstore._dict.items()):
-        log.info(f"[{i+1}] ID={doc_id}")
-        log.info(f"Metadata: {doc.metadata}")
-        log.info(f"Snippet: {doc.page_content[:900].replace(chr(10), ' ')} ...\n")
-        if i + 1 >= limit:
-            break
+def _inspect_legacy(limit):
+    db = FAISS.load_local(INDEX_PATH, provider_embeddings(), allow_dangerous_deserialization=True)
+    log.info(f"✅ Loaded legacy pickled FAISS index from {INDEX_PATH}")
+    log.info(f"📦 Total documents: {len(db.index_to_docstore_id)}\n")
+    for i, (pos, doc_id) in enumerate(sorted(db.index_to_docstore_id.items())[:limit]):
+        _log_doc(i + 1, pos, doc_id, db.docstore.search(doc_id))
 
 # -------------------------------------------------------------------
 if __name__ == "__main__":
-    inspect_faiss(limit=20)
+    parser = argparse.ArgumentParser(description="Preview FAISS index contents")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--after", type=int, default=-1, help="show chunks after this FAISS position")
+    parser.add_argument("--source", help="only chunks of this source")
+    parser.add_argument("--sources", action="store_true", help="list sources with chunk counts")
+    args = parser.parse_args()
+    inspect_faiss(limit=args.limit, after=args.after, source=args.source, list_sources=args.sources)
@@ -0,0 +1,111 @@
+"""
+AutoResQ RAG - reranker.py
+--------------------------
+Second retrieval stage: a small cross-encoder on CPU (RAG_RERANK=1).
+
+`rag_ai_engine.retrieve` widens the first stage to RAG_RERANK_CANDIDATES
+(default 50) and reorders them here by a cross-encoder's relevance
+probability for (alert, chunk) — RAG_RERANK_MODEL, loaded once per process
+through `transformers`.
+
+- Pairs are scored in batches of RAG_RERANK_BATCH_SIZE under torch.inference_mode.
+- Latency is capped by RAG_RERANK_DEADLINE_MS: before each batch the
+  remaining time is compared with the last batch's duration, and the
+  lowest-ranked (not yet scored) candidates are dropped once it runs short.
+- Any failure (model missing, torch not installed) returns None and the
+  caller keeps the first-stage order.
+"""
+
+import os, time, logging, threading
+from app.utils import metrics
+
+log = logging.getLogger("AutoResQ-RAG")
+
+RERANK = os.getenv("RAG_RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", 50))
+RERANK_BATCH_SIZE = int(os.getenv("RAG_RERANK_BATCH_SIZE", 16))
+RERANK_DEADLINE_MS = float(os.getenv("RAG_RERANK_DEADLINE_MS", 300))
+RERANK_MAX_LENGTH = int(os.getenv("RAG_RERANK_MAX_LENGTH", 256))
+RERANK_THREADS = int(os.getenv("RAG_RERANK_THREADS", min(4, os.cpu_count() or 1)))
+
+
+class CrossEncoderReranker:
+    """Lazily loaded sequence-classification model scoring (query, passage) pairs."""
+
+    def __init__(self, model_name: str = RERANK_MODEL):
+        self.model_name = model_name
+        self._tokenizer = self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        if self._model is not None or self._failed:
+            return not self._failed
+        with self._lock:
+            if self._model is None and not self._failed:
+                started = time.perf_counter()
+                try:
+                    import torch
+                    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+                    torch.set_num_threads(RERANK_THREADS)
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                    self._model = AutoModelForSequenceClassification.from_pretrained(self.model_name).eval()
+                    log.info(f"🎚️ Reranker {self.model_name} loaded on CPU in {time.perf_counter() - started:.1f}s")
+                except Exception as e:
+                    self._failed = True
+                    log.error(f"❌ Reranker {self.model_name} unavailable, keeping first-stage order: {e}")
+        return not self._failed
+
+    def score(self, query: str, passages) -> list:
+        """Relevance probability in [0, 1] for each passage."""
+        import torch
+
+        enc = self._tokenizer([query] * len(passages), list(passages), padding=True, truncation=True,
+                              max_length=RERANK_MAX_LENGTH, return_tensors="pt")
+        with torch.inference_mode():
+            logits = self._model(**enc).logits
+        if logits.shape[-1] == 1:
+            probs = torch.sigmoid(logits[:, 0])
+        else:
+            probs = torch.softmax(logits, dim=-1)[:, -1]
+        return probs.tolist()
+
+    def rerank(self, query: str, results, top_k: int = 5, deadline_ms: float = RERANK_DEADLINE_MS):
+        """[(Document, score)] → [(Document, probability)] best first, or None if the model is unavailable."""
+        if not results or not self.load():
+            return None
+        started = time.perf_counter()
+        deadline = started + deadline_ms / 1000
+        scored, last_batch = [], 0.0
+        for i in range(0, len(results), RERANK_BATCH_SIZE):
+            if scored and time.perf_counter() + last_batch > deadline:
+                dropped = len(results) - i
+                metrics.inc("autoresq_rerank_dropped_total", dropped,
+                            help="First-stage candidates dropped by the rerank deadline")
+                log.warning(f"⏳ Rerank deadline {deadline_ms:.0f}ms: dropped {dropped} lower-ranked candidate(s)")
+                break
+            batch = [doc for doc, _ in results[i:i + RERANK_BATCH_SIZE]]
+            batch_started = time.perf_counter()
+            try:
+                probs = self.score(query, [doc.page_content for doc in batch])
+            except Exception as e:
+                log.error(f"❌ Rerank batch failed: {e}")
+                if not scored:
+                    return None
+                break
+            last_batch = time.perf_counter() - batch_started
+            scored.extend(zip(batch, probs))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        elapsed = time.perf_counter() - started
+        metrics.observe("autoresq_rerank_seconds", elapsed, help="Cross-encoder rerank latency")
+        log.info(f"🎚️ Reranked {len(scored)}/{len(results)} candidates in {elapsed * 1000:.0f}ms")
+        return scored[:top_k]
+
+
+_reranker = CrossEncoderReranker()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    return _reranker
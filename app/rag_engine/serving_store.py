@@ -0,0 +1,273 @@
+"""
+AutoResQ RAG - serving_store.py
+-------------------------------
+On-disk format of the FAISS index and its compact docstore.
+
+An index directory holds `index.faiss` (the vectors) and `docstore.sqlite`,
+keyed by FAISS position (= vector id):
+- chunks(pos, doc_id, text)              chunk text stored once, zlib-compressed
+- meta(pos, source, page, row, extra)    metadata as a columnar side table;
+                                         keys without a column go to `extra` (JSON)
+- lexical(rowid=pos)                     contentless FTS5 index of the chunk text
+                                         (identifiers like WMQ_IN stay one token)
+
+This replaces LangChain's pickled InMemoryDocstore (index.pkl). At serving
+time:
+- vectors are opened with faiss IO_FLAG_MMAP_IFC (the index's arrays point
+  into the mapped file), so every gunicorn worker on a host shares the same
+  page-cache pages instead of holding its own copy. Plain IO_FLAG_MMAP |
+  IO_FLAG_READ_ONLY still copies flat/HNSW vectors into private memory
+  (bench_serving_memory.py measures both);
+- the docstore is read lazily — only the top-k hits of a query are ever
+  decompressed and turned into Documents.
+
+Cold start is therefore a couple of file opens, independent of corpus size.
+Indexes saved in the legacy pickle format are still opened via load_local.
+Set RAG_SERVING_MMAP=0 to read the vectors into memory instead of mapping them.
+"""
+
+import os, json, zlib, sqlite3, logging, threading
+from langchain.schema import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+log = logging.getLogger("AutoResQ-RAG")
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+LEGACY_PICKLE_FILE = "index.pkl"
+SERVING_MMAP = os.getenv("RAG_SERVING_MMAP", "1") == "1"
+
+# Metadata keys promoted to their own column, with the type they hold
+META_COLUMNS = {"source": str, "page": int, "row": int}
+
+SCHEMA = """
+CREATE TABLE chunks (
+  pos INTEGER PRIMARY KEY,
+  doc_id TEXT NOT NULL UNIQUE,
+  text BLOB NOT NULL
+);
+CREATE TABLE meta (
+  pos INTEGER PRIMARY KEY,
+  source TEXT,
+  page INTEGER,
+  row INTEGER,
+  extra TEXT
+);
+CREATE INDEX idx_meta_source ON meta(source);
+CREATE VIRTUAL TABLE lexical USING fts5(text, content='', tokenize="unicode61 tokenchars '_'");
+"""
+
+
+def mmap_flags() -> int:
+    import faiss
+    # faiss < 1.8 has no IFC flag; there MMAP | READ_ONLY is the best available
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+
+def _split_metadata(metadata: dict):
+    """metadata → ({column: value}, extra JSON or None)."""
+    columns, extra = {}, {}
+    for key, value in metadata.items():
+        kind = META_COLUMNS.get(key)
+        if kind is str and isinstance(value, str):
+            columns[key] = value
+        elif kind is int and isinstance(value, int) and not isinstance(value, bool):
+            columns[key] = int(value)
+        elif kind is int and hasattr(value, "dtype") and value.dtype.kind in "iu":
+            columns[key] = int(value)  # numpy ints from pandas rows
+        else:
+            extra[key] = value
+    return columns, (json.dumps(extra, default=str) if extra else None)
+
+
+def _join_metadata(source, page, row, extra) -> dict:
+    metadata = {k: v for k, v in (("source", source), ("page", page), ("row", row)) if v is not None}
+    if extra:
+        metadata.update(json.loads(extra))
+    return metadata
+
+
+# -------------------------------------------------------------------
+# Export (builder side)
+# -------------------------------------------------------------------
+def export_docstore(db, path: str):
+    """Write db's docstore as docstore.sqlite at path (FAISS position order)."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.executescript(SCHEMA)
+        chunk_rows, meta_rows, lexical_rows = [], [], []
+        for pos, doc_id in sorted(db.index_to_docstore_id.items()):
+            doc = db.docstore.search(doc_id)
+            columns, extra = _split_metadata(doc.metadata)
+            chunk_rows.append((pos, doc_id, zlib.compress(doc.page_content.encode("utf-8"))))
+            meta_rows.append((pos, columns.get("source"), columns.get("page"), columns.get("row"), extra))
+            lexical_rows.append((pos, doc.page_content))
+        with conn:
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?)", chunk_rows)
+            conn.executemany("INSERT INTO meta VALUES (?, ?, ?, ?, ?)", meta_rows)
+            conn.executemany("INSERT INTO lexical (rowid, text) VALUES (?, ?)", lexical_rows)
+    finally:
+        conn.close()
+
+
+def save_store(db, directory: str):
+    """Write index.faiss + docstore.sqlite for db into directory."""
+    import faiss
+
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(db.index, os.path.join(directory, INDEX_FILE))
+    export_docstore(db, os.path.join(directory, DOCSTORE_FILE))
+
+
+# -------------------------------------------------------------------
+# Read-only access
+# -------------------------------------------------------------------
+class _ReadOnlyDB:
+    """Read-only SQLite connection opened at load time.
+
+    Opening eagerly pins the inode of this build's docstore, so a snapshot
+    keeps reading its own file even after a newer build replaces it.
+    """
+
+    def __init__(self, path: str):
+        uri = f"file:{os.path.abspath(path)}?mode=ro&immutable=1"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self._lock = threading.Lock()
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+_DOC_SELECT = (
+    "SELECT c.pos, c.doc_id, c.text, m.source, m.page, m.row, m.extra "
+    "FROM chunks c JOIN meta m ON m.pos = c.pos"
+)
+
+
+def _row_to_doc(row):
+    pos, doc_id, text, source, page, row_no, extra = row
+    doc = Document(
+        page_content=zlib.decompress(text).decode("utf-8"),
+        metadata=_join_metadata(source, page, row_no, extra),
+    )
+    return pos, doc_id, doc
+
+
+class CompactDocstore(Docstore):
+    """Lazy LangChain Docstore over docstore.sqlite; documents are built per lookup."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = _ReadOnlyDB(path)
+
+    def search(self, search: str):
+        rows = self._db.execute(f"{_DOC_SELECT} WHERE c.doc_id=?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        return _row_to_doc(rows[0])[2]
+
+    def count(self, source: str = None) -> int:
+        if source:
+            return self._db.execute("SELECT COUNT(*) FROM meta WHERE source=?", (source,))[0][0]
+        return self._db.execute("SELECT COUNT(*) FROM chunks")[0][0]
+
+    def page(self, after_pos: int = -1, limit: int = 20, source: str = None):
+        """Keyset-paginated [(pos, doc_id, Document)] in FAISS position order."""
+        where, params = "c.pos > ?", [after_pos]
+        if source:
+            where += " AND m.source = ?"
+            params.append(source)
+        rows = self._db.execute(f"{_DOC_SELECT} WHERE {where} ORDER BY c.pos LIMIT ?", (*params, limit))
+        return [_row_to_doc(r) for r in rows]
+
+    def lexical_search(self, match: str, limit: int = 20):
+        """[(pos, doc_id, Document, bm25)] for an FTS5 MATCH expression, best first.
+
+        Empty for docstores exported before the lexical index existed.
+        """
+        try:
+            hits = self._db.execute(
+                "SELECT rowid, bm25(lexical) FROM lexical WHERE lexical MATCH ? ORDER BY bm25(lexical) LIMIT ?",
+                (match, limit),
+            )
+        except sqlite3.OperationalError as e:
+            log.debug(f"Lexical search unavailable for {self.path}: {e}")
+            return []
+        if not hits:
+            return []
+        rank = dict(hits)
+        marks = ",".join("?" * len(rank))
+        rows = self._db.execute(f"{_DOC_SELECT} WHERE c.pos IN ({marks})", tuple(rank))
+        return sorted(((*_row_to_doc(r), rank[r[0]]) for r in rows), key=lambda hit: hit[3])
+
+    def sources(self):
+        """[(source, chunk count)], answered from the metadata table alone."""
+        return self._db.execute("SELECT source, COUNT(*) FROM meta GROUP BY source ORDER BY source")
+
+    def load_all(self) -> InMemoryDocstore:
+        """Materialize every Document (builder side, where the store is mutated)."""
+        return InMemoryDocstore({doc_id: doc for _, doc_id, doc in map(_row_to_doc, self._db.execute(_DOC_SELECT))})
+
+
+class SqliteIndexToDocstoreId:
+    """Read-only mapping FAISS position → docstore id, backed by docstore.sqlite."""
+
+    def __init__(self, docstore: CompactDocstore):
+        self._db = docstore._db
+        self._len = docstore.count()
+
+    def __getitem__(self, pos):
+        rows = self._db.execute("SELECT doc_id FROM chunks WHERE pos=?", (int(pos),))
+        if not rows:
+            raise KeyError(pos)
+        return rows[0][0]
+
+    def get(self, pos, default=None):
+        try:
+            return self[pos]
+        except KeyError:
+            return default
+
+    def __len__(self):
+        return self._len
+
+    def items(self):
+        return iter(self._db.execute("SELECT pos, doc_id FROM chunks ORDER BY pos"))
+
+    def values(self):
+        return (doc_id for _, doc_id in self.items())
+
+
+# -------------------------------------------------------------------
+# Loading
+# -------------------------------------------------------------------
+def open_index(index_path: str, embeddings, writable: bool = False):
+    """Open an index directory as a LangChain FAISS store. None if there is none.
+
+    writable=False (serving): mmap'ed vectors (RAG_SERVING_MMAP) + lazy docstore.
+    writable=True (builder): in-memory vectors and docstore supporting
+    add/delete. Directories in the legacy pickle format go through load_local.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    docstore_path = os.path.join(index_path, DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        if os.path.exists(os.path.join(index_path, LEGACY_PICKLE_FILE)):
+            log.info(f"📦 Loading legacy pickled docstore at {index_path}")
+            return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        return None
+
+    flags = mmap_flags() if SERVING_MMAP and not writable else 0
+    index = faiss.read_index(os.path.join(index_path, INDEX_FILE), flags)
+    docstore = CompactDocstore(docstore_path)
+    if writable:
+        return FAISS(embeddings, index, docstore.load_all(), dict(SqliteIndexToDocstoreId(docstore).items()))
+    log.debug(f"Opened FAISS index (mmap={bool(flags)}) + compact docstore at {index_path}")
+    return FAISS(embeddings, index, docstore, SqliteIndexToDocstoreId(docstore))
@@ -0,0 +1,135 @@
+"""
+AutoResQ RAG - sop_summaries.py
+-------------------------------
+Offline, index-time step summaries of SOP sections (RAG_SOP_SUMMARIES=1).
+
+For every indexed chunk that looks like an SOP section (numbered/bulleted
+steps, or a source named like an SOP/runbook/playbook), the LLM writes a short
+structured summary once. It is stored in the chunk's metadata
+(`sop_summary`, plus the detected `sop_section` heading), i.e. next to the
+vector in the docstore, so `rag_ai_engine` can answer near-exact matches
+without a live LLM call.
+
+Incremental: summaries are cached in SQLite (RAG_SOP_SUMMARY_CACHE_PATH) by
+LLM model + prompt version + sha256 of the chunk text, and only chunks
+without a summary are visited — so the LLM runs once per document version,
+not once per build or per alert.
+"""
+
+import os, re, time, sqlite3, hashlib, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("AutoResQ-RAG")
+
+SOP_SUMMARIES = os.getenv("RAG_SOP_SUMMARIES", "0") == "1"
+SOP_SUMMARY_CACHE_PATH = os.getenv("RAG_SOP_SUMMARY_CACHE_PATH", "sop_summaries.sqlite")
+SOP_SUMMARY_WORKERS = int(os.getenv("RAG_SOP_SUMMARY_WORKERS", 4))
+SOP_SUMMARY_MAX_STEPS = int(os.getenv("RAG_SOP_SUMMARY_MAX_STEPS", 8))
+PROMPT_VERSION = "1"
+
+_STEP_LINE = re.compile(r"^\s*(\d+[.)]|step\s*\d+|[-*•])\s+\S", re.IGNORECASE | re.MULTILINE)
+_SOP_SOURCE = re.compile(r"sop|runbook|playbook|procedure|rca", re.IGNORECASE)
+
+PROMPT = """
+You are AutoResQ, an AI-powered incident responder, preparing an on-call quick reference.
+
+Summarize the SOP section below as:
+- first line: the scenario it covers (max 12 words)
+- then at most {max_steps} numbered, imperative resolution steps
+Keep exact commands, queue/host/service names and thresholds. No preamble.
+Respond in plain text — do not include code blocks or markdown fencing.
+
+SOP Section:
+{text}
+"""
+
+
+def sop_section_heading(text: str, source: str = ""):
+    """Heading of an SOP section, or None if the chunk does not look like one."""
+    steps = len(_STEP_LINE.findall(text))
+    if steps < 2 and not (steps and _SOP_SOURCE.search(os.path.basename(source or ""))):
+        return None
+    for line in text.splitlines():
+        line = line.strip().strip("#*").strip()
+        if line and not _STEP_LINE.match(line):
+            return line[:120]
+    return os.path.basename(source or "") or "SOP"
+
+
+class SummaryCache:
+    """text-hash → summary, persisted in SQLite and shared across builds."""
+
+    def __init__(self, path: str = SOP_SUMMARY_CACHE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL)"
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}|{PROMPT_VERSION}|{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, summary: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (key, summary, time.time()))
+
+
+def _clean(text: str) -> str:
+    text = (text or "").strip().strip("`").replace("```", "")
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def attach_summaries(docs, provider=None, cache: SummaryCache = None, workers: int = SOP_SUMMARY_WORKERS) -> int:
+    """Add metadata["sop_summary"] to SOP-section docs that lack one. Returns how many were added."""
+    if provider is None:
+        from app.llm_providers.registry import get_provider
+        provider = get_provider()
+    cache = cache or SummaryCache()
+    model = provider.llm_model
+
+    todo = []
+    for doc in docs:
+        if doc.metadata.get("sop_summary"):
+            continue
+        heading = sop_section_heading(doc.page_content, doc.metadata.get("source", ""))
+        if heading:
+            todo.append((doc, heading, cache.key(model, doc.page_content)))
+    if not todo:
+        return 0
+
+    def summarize(item):
+        doc, _, key = item
+        summary = cache.get(key)
+        if summary is None:
+            prompt = PROMPT.format(max_steps=SOP_SUMMARY_MAX_STEPS, text=doc.page_content.strip())
+            summary = _clean(provider.generate_text(prompt, temperature=0.0))
+            if summary:
+                cache.put(key, summary)
+            return summary, True
+        return summary, False
+
+    started, added, generated, failed = time.perf_counter(), 0, 0, 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sop-summary") as pool:
+        futures = [(item, pool.submit(summarize, item)) for item in todo]
+        for (doc, heading, _), future in futures:
+            try:
+                summary, fresh = future.result()
+            except Exception as e:
+                failed += 1
+                log.warning(f"⚠️ SOP summary failed for {doc.metadata.get('source')}: {e}")
+                continue
+            if summary:
+                doc.metadata["sop_section"] = heading
+                doc.metadata["sop_summary"] = summary
+                added += 1
+                generated += fresh
+    log.info(f"📝 SOP summaries: {added} attached ({generated} generated, {added - generated} cached, "
+             f"{failed} failed) in {time.perf_counter() - started:.1f}s")
+    return added
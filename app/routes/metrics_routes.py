@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from app.utils import metrics
+
+bp = Blueprint("metrics_routes", __name__)
+
+@bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (queue depth, job and triage metrics)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
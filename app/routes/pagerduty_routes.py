@@ -1,28 +1,36 @@
 from flask import Blueprint, request, jsonify
 
 from app.routes.slack_actions import attach_feedback_buttons
-from app.utils.ai_utils import get_ai_suggestion
+from app.utils.ai_utils import get_ai_triage
 from app.utils.slack_utils import client, SLACK_CHANNEL
 from app.utils.log_utils import jdump
-import logging
+from app.utils.job_queue import enqueue, register_handler, RetryLater
+from app.utils.event_store import get_event_store
+from app.utils.alert_coalescer import ALERT_COALESCE, LEADER_WAIT_SECONDS, get_coalescer
+from app.utils import metrics
+import logging, time
 
 bp = Blueprint("pagerduty_routes", __name__)
 logger = logging.getLogger("autoresq")
 
-import sqlite3, datetime, json, os
+import datetime, os
 from dotenv import load_dotenv
 load_dotenv()
 
-DB_PATH = os.getenv("DATABASE_PATH")
+SLACK_STREAMING = os.getenv("SLACK_STREAMING", "1") == "1"
+SLACK_STREAM_UPDATE_SECONDS = float(os.getenv("SLACK_STREAM_UPDATE_SECONDS", 1.0))
+
+def parse_incident(payload):
+    """(event_type, incident) from both PagerDuty payload shapes (v3 webhook / legacy)."""
+    event_type = payload.get("event", {}).get("event_type") or payload.get("event_type", "unknown")
+    incident = payload.get("event", {}).get("data") or payload.get("incident") or {}
+    return event_type, incident
 
 def insert_event(payload):
-    """Insert a new PagerDuty alert into the events table."""
+    """Insert a new PagerDuty alert into the events table. Returns the event row id."""
     try:
-        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-
         # ✅ Extract data from both possible payload shapes
-        event_type = payload.get("event", {}).get("event_type") or payload.get("event_type", "unknown")
-        incident = payload.get("event", {}).get("data") or payload.get("incident") or {}
+        event_type, incident = parse_incident(payload)
 
         incident_id = incident.get("id", "N/A")
         title = incident.get("title") or incident.get("summary") or "PagerDuty Incident"
@@ -30,98 +38,254 @@ def insert_event(payload):
         status = incident.get("status", "triggered").upper()
         service = (incident.get("service") or {}).get("summary", "PagerDuty")
 
-        details = json.dumps(incident, indent=2)
         ai_plan = "AI plan pending"
 
-        with conn:
-            conn.execute("""
-                INSERT INTO events (
-                    incident_id,
-                    received_at,
-                    event_type,
-                    summary,
-                    service,
-                    details,
-                    raw_json,
-                    ai_plan,
-                    status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                incident_id,  # e.g. "Q1X7SI90B4Z1E6"
-                datetime.datetime.utcnow().isoformat(),
-                status,  # event_type = current incident status
-                f"{title}",  # summary = title + ID
-                service,  # service name
-                details,  # full incident object or description
-                json.dumps(payload, indent=2),  # raw payload
-                ai_plan,
-                "NEW"
-            ))
+        event_id = get_event_store().insert_event(
+            incident_id,  # e.g. "Q1X7SI90B4Z1E6"
+            datetime.datetime.utcnow().isoformat(),
+            status,  # event_type = current incident status
+            f"{title}",  # summary = title + ID
+            service,  # service name
+            payload,  # raw payload, stored once (details are projected from it)
+            ai_plan,
+            "NEW",
+        )
 
         print(f"✅ Stored PagerDuty incident {incident_id}: {title} [{status}]")
+        return event_id
 
     except Exception as e:
         print(f"❌ DB insert failed: {e}")
+        return None
+
+def record_suggestion(alert, coalesced=False):
+    """Count the suggestion's source (its triage path, or coalesced) in the analytics rollups."""
+    try:
+        source = "coalesced" if coalesced else alert.get("ai_path") or "error"
+        get_event_store().record_suggestion(alert["incident_id"], alert["service"], source)
+    except Exception as e:
+        logger.warning("Suggestion rollup failed | incident=%s error=%s", alert.get("incident_id"), e)
+
+def update_ai_plan(event_id, ai_plan):
+    """Store the triage result on the event row."""
+    if not event_id:
+        return
+    try:
+        get_event_store().update_ai_plan(event_id, ai_plan)
+    except Exception as e:
+        logger.warning("AI plan update failed | event=%s error=%s", event_id, e)
 
 @bp.route("/", methods=["POST"])
 def pd_webhook():
-    """Receive PagerDuty webhook and forward to Slack."""
+    """Receive PagerDuty webhook: persist, enqueue triage, acknowledge immediately."""
     payload = request.get_json(silent=True) or {}
     logger.info("Alert payload received")
     logger.debug("Alert payload received:\n%s", jdump(payload))
-    insert_event(payload)
-    event_type = payload.get("event", {}).get("event_type") or payload.get("event_type", "unknown")
-    incident = payload.get("event", {}).get("data") or payload.get("incident") or {}
+    event_id = insert_event(payload)
+    try:
+        job_id = enqueue("pd_alert", {"event_id": event_id, "payload": payload})
+    except Exception as e:
+        # Not queued → let PagerDuty retry the delivery
+        logger.exception("Alert enqueue failed | event=%s error=%s", event_id, e)
+        return jsonify({"status": "error"}), 503
+    logger.info("Alert queued | event=%s job=%s", event_id, job_id)
+    return jsonify({"status": "queued", "job_id": job_id}), 200
+
+# -------------------------------------------------------------------
+# Job handlers (run by the worker pool, see app/utils/job_queue.py)
+# -------------------------------------------------------------------
+def process_alert(job):
+    """Triage one alert, store the plan and queue the Slack delivery.
+
+    Triggered alerts are coalesced first: only a group's leader is triaged,
+    followers are queued as threaded replies under the leader's message.
+    """
+    payload, event_id = job["payload"], job.get("event_id")
+    event_type, incident = parse_incident(payload)
     incident_id = incident.get("id", "N/A")
     summary = incident.get("summary") or incident.get("title") or "No summary"
     service = (incident.get("service") or {}).get("summary", "unknown")
-    title = incident.get("title", "N/A")
+    alert = {
+        "event_type": event_type,
+        "incident_id": incident_id,
+        "summary": summary,
+        "service": service,
+        "title": incident.get("title", "N/A"),
+        "ai_suggestion": None,
+        "ai_path": None,
+        "group_id": None,
+    }
 
-    ai_suggestion = None
     if event_type.lower() in ["incident.triggered", "trigger"]:
-        ai_suggestion = get_ai_suggestion(summary)
+        group = get_coalescer().assign(service, summary, event_id, incident_id) if ALERT_COALESCE else None
+        if group is not None and not group.leader:
+            update_ai_plan(event_id, f"Coalesced with incident {group.leader_incident_id} (event {group.leader_event_id})")
+            record_suggestion(alert, coalesced=True)
+            enqueue("slack_followup", {**alert, "group_id": group.id})
+            return
+        if group is not None:
+            alert["group_id"] = group.id
+        if SLACK_STREAMING and _triage_streaming(alert):
+            update_ai_plan(event_id, alert["ai_suggestion"])
+            record_suggestion(alert)
+            return
+        alert["ai_suggestion"], alert["ai_path"] = get_ai_triage(summary)
+        update_ai_plan(event_id, alert["ai_suggestion"])
+        record_suggestion(alert)
+        if group is not None:
+            get_coalescer().set_suggestion(group.id, alert["ai_suggestion"])
+
+    enqueue("slack_alert", alert)
 
+def _action_blocks(incident_id):
+    return {
+        "type": "actions",
+        "block_id": incident_id,
+        "elements": [
+            {"type": "button", "text": {"type": "plain_text", "text": "Acknowledge"}, "value": "ack", "style": "primary"},
+            {"type": "button", "text": {"type": "plain_text", "text": "Resolve"}, "value": "resolve", "style": "danger"},
+        ],
+    }
+
+def format_suggestion(ai_suggestion):
+    """Slack mrkdwn cleanup + length cap for the AI Suggestion section."""
+    clean = (
+        ai_suggestion.replace("```", "")
+        .replace("#", "")
+        .replace("**", "*")
+        .strip()
+    )
+    if len(clean) > 3400:
+        clean = clean[:3400] + "..."
+    return clean
+
+def _alert_blocks(alert, suggestion_text=None):
     blocks = [
         {
             "type": "section",
             "text": {
                 "type": "mrkdwn",
                 "text": (
-                    f"🚨 *Incident Alert* for `{service}`\n"
-                    f"*Event:* {event_type}\n"
-                    f"*Title:* {title}\n"
-                    f"*Summary:* {summary}\n"
-                    f"*Incident ID:* `{incident_id}`"
+                    f"🚨 *Incident Alert* for `{alert['service']}`\n"
+                    f"*Event:* {alert['event_type']}\n"
+                    f"*Title:* {alert['title']}\n"
+                    f"*Summary:* {alert['summary']}\n"
+                    f"*Incident ID:* `{alert['incident_id']}`"
                 ),
             },
         }
     ]
+    if suggestion_text:
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": f"💡 *AI Suggestion:*\n{suggestion_text}"}})
+    blocks.append(_action_blocks(alert["incident_id"]))
+    return blocks
 
-    if ai_suggestion:
-        clean = (
-            ai_suggestion.replace("```", "")
-            .replace("#", "")
-            .replace("**", "*")
-            .strip()
-        )
-        if len(clean) > 3400:
-            clean = clean[:3400] + "..."
-        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": f"💡 *AI Suggestion:*\n{clean}"}})
+def _alert_text(alert):
+    return f"🚨 Incident for `{alert['service']}`: {alert['summary']}"
 
-    blocks.append({
-        "type": "actions",
-        "block_id": incident_id,
-        "elements": [
-            {"type": "button", "text": {"type": "plain_text", "text": "Acknowledge"}, "value": "ack", "style": "primary"},
-            {"type": "button", "text": {"type": "plain_text", "text": "Resolve"}, "value": "resolve", "style": "danger"},
-        ],
-    })
+def deliver_alert(job):
+    """Post the incident (and AI suggestion) to Slack. Raises on failure so the job is retried."""
+    ai_suggestion = job["ai_suggestion"]
+    blocks = _alert_blocks(job, format_suggestion(ai_suggestion) if ai_suggestion else None)
 
+    resp = client.chat_postMessage(channel=SLACK_CHANNEL, text=_alert_text(job), blocks=blocks)
+    logger.info("Slack post OK | ts=%s", resp.data.get("ts"))
+    if job.get("group_id"):
+        get_coalescer().set_slack_ts(job["group_id"], resp["ts"])
     try:
-        resp = client.chat_postMessage(channel=SLACK_CHANNEL, text=f"🚨 Incident for `{service}`: {summary}", blocks=blocks)
-        attach_feedback_buttons(client, SLACK_CHANNEL, resp["ts"], incident_id, ai_suggestion)
-        logger.info("Slack post OK | ts=%s", resp.data.get("ts"))
+        attach_feedback_buttons(client, SLACK_CHANNEL, resp["ts"], job["incident_id"], ai_suggestion)
     except Exception as e:
-        logger.exception("Slack post failed | incident=%s error=%s", incident_id, e)
+        # The alert itself is delivered; do not retry (it would post it twice)
+        logger.exception("Slack feedback buttons failed | incident=%s error=%s", job["incident_id"], e)
+
+# -------------------------------------------------------------------
+# Streaming delivery: post first, then fill in the suggestion as it streams
+# -------------------------------------------------------------------
+class _StreamingMessage:
+    """Throttled chat_update of the AI Suggestion section while the LLM streams."""
+
+    def __init__(self, alert, channel, ts):
+        self.alert, self.channel, self.ts = alert, channel, ts
+        self.started = time.monotonic()
+        self._last_update = 0.0
+        self._last_text = None
+
+    def push(self, text):
+        now = time.monotonic()
+        if not text or text == self._last_text or now - self._last_update < SLACK_STREAM_UPDATE_SECONDS:
+            return
+        if self._last_text is None:
+            metrics.observe("autoresq_slack_first_text_seconds", now - self.started,
+                            help="Time from incident post to first streamed suggestion text")
+        self._last_update, self._last_text = now, text
+        try:
+            client.chat_update(channel=self.channel, ts=self.ts, text=_alert_text(self.alert),
+                               blocks=_alert_blocks(self.alert, format_suggestion(text) + " ▌"))
+        except Exception as e:
+            logger.debug("Streaming chat_update skipped | ts=%s error=%s", self.ts, e)
+
+def _triage_streaming(alert):
+    """Post the incident now and stream the AI suggestion into it. False if Slack was unreachable."""
+    try:
+        resp = client.chat_postMessage(channel=SLACK_CHANNEL, text=_alert_text(alert),
+                                       blocks=_alert_blocks(alert, "_Analyzing alert…_"))
+    except Exception as e:
+        logger.warning("Streaming post failed, falling back to queued delivery | incident=%s error=%s",
+                       alert["incident_id"], e)
+        return False
+    channel, ts = resp["channel"], resp["ts"]
+    if alert.get("group_id"):
+        get_coalescer().set_slack_ts(alert["group_id"], ts)
+
+    alert["ai_suggestion"], alert["ai_path"] = get_ai_triage(
+        alert["summary"], on_partial=_StreamingMessage(alert, channel, ts).push
+    )
+    if alert.get("group_id"):
+        get_coalescer().set_suggestion(alert["group_id"], alert["ai_suggestion"])
+    try:
+        update_alert({"channel": channel, "ts": ts, "alert": alert})
+    except Exception as e:
+        logger.warning("Final chat_update failed, queued for retry | ts=%s error=%s", ts, e)
+        enqueue("slack_update", {"channel": channel, "ts": ts, "alert": alert})
+    try:
+        attach_feedback_buttons(client, SLACK_CHANNEL, ts, alert["incident_id"], alert["ai_suggestion"])
+    except Exception as e:
+        logger.exception("Slack feedback buttons failed | incident=%s error=%s", alert["incident_id"], e)
+    logger.info("Slack streamed post OK | ts=%s", ts)
+    return True
+
+def update_alert(job):
+    """Replace a posted incident message with its final suggestion."""
+    alert = job["alert"]
+    ai_suggestion = alert.get("ai_suggestion")
+    client.chat_update(channel=job["channel"], ts=job["ts"], text=_alert_text(alert),
+                       blocks=_alert_blocks(alert, format_suggestion(ai_suggestion) if ai_suggestion else None))
+
+def deliver_followup(job):
+    """Reply in the leader's thread for a coalesced alert (reusing its suggestion)."""
+    group = get_coalescer().get(job["group_id"])
+    if group is None or not group.slack_ts:
+        if group is not None and time.time() - group.created_at < LEADER_WAIT_SECONDS:
+            raise RetryLater(5)  # leader not posted yet
+        # Leader never made it to Slack: post on our own with whatever it produced
+        deliver_alert({**job, "group_id": None, "ai_suggestion": group.ai_suggestion if group else None})
+        return
+
+    text = (
+        f"🔁 *Correlated alert* for `{job['service']}` (#{group.members} in this group)\n"
+        f"*Summary:* {job['summary']}\n"
+        f"*Incident ID:* `{job['incident_id']}`\n"
+        f"💡 Same root cause as `{group.leader_incident_id}` — see the AI suggestion above."
+    )
+    client.chat_postMessage(
+        channel=SLACK_CHANNEL,
+        thread_ts=group.slack_ts,
+        text=f"🔁 Correlated alert: {job['summary']}",
+        blocks=[{"type": "section", "text": {"type": "mrkdwn", "text": text}}, _action_blocks(job["incident_id"])],
+    )
+    logger.info("Slack follow-up OK | incident=%s thread=%s", job["incident_id"], group.slack_ts)
 
-    return jsonify({"status": "ok"}), 200
+register_handler("pd_alert", process_alert)
+register_handler("slack_alert", deliver_alert)
+register_handler("slack_followup", deliver_followup)
+register_handler("slack_update", update_alert)
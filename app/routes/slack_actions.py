@@ -1,6 +1,7 @@
 from flask import Blueprint, request, abort
 from app.utils.slack_utils import client, signature_verifier
 from app.utils.log_utils import jdump
+from app.utils.event_store import get_event_store
 import json, logging
 
 bp = Blueprint("slack_actions", __name__)
@@ -84,6 +85,12 @@ def slack_actions():
         else:
             msg = f"🎉 {user} resolved incident `{incident_id}`"
 
+        try:
+            # actions table + incident timeline (MTTA / MTTR rollups)
+            get_event_store().record_action(incident_id, action_value, user)
+        except Exception as e:
+            logger.exception("Action record failed | incident=%s action=%s error=%s", incident_id, action_value, e)
+
         try:
             client.chat_postMessage(channel=channel_id, text=msg)
             logger.info("Slack confirmation OK | incident=%s action=%s", incident_id, action_value)
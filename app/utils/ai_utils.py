@@ -1,16 +1,20 @@
-from app.rag_ai_engine import generate_solution
+from app.rag_ai_engine import triage
 import logging
 
 logger = logging.getLogger("autoresq")
 
-def get_ai_suggestion(summary: str):
-    """Wrapper to safely call AI engine."""
+def get_ai_triage(summary: str, on_partial=None):
+    """Safely call the AI engine → (suggestion, path). path: cache | zero_llm | sop | generic | error."""
     try:
-        suggestion = generate_solution(summary)
-        if not suggestion or "unavailable" in suggestion.lower():
+        suggestion, path = triage(summary, on_partial=on_partial)
+        if path == "error" or not suggestion:
             logger.warning("AI suggestion unavailable.")
-            return "AI suggestion unavailable."
-        return suggestion
+            return "AI suggestion unavailable.", "error"
+        return suggestion, path
     except Exception as e:
         logger.exception("AI generation failed: %s", e)
-        return "AI suggestion unavailable (error)."
+        return "AI suggestion unavailable (error).", "error"
+
+def get_ai_suggestion(summary: str, on_partial=None):
+    """Wrapper to safely call AI engine. on_partial(text) receives streamed progress."""
+    return get_ai_triage(summary, on_partial=on_partial)[0]
@@ -0,0 +1,202 @@
+"""
+AutoResQ - alert_coalescer.py
+-----------------------------
+Groups correlated alerts so one upstream failure is triaged once.
+
+An incoming triggered alert joins an open group when, within
+ALERT_COALESCE_WINDOW_SECONDS of the group's last alert, either
+- its fingerprint (service + normalized summary: ids, numbers, hosts and
+  timestamps masked) matches, or
+- its summary embedding has cosine similarity >= ALERT_COALESCE_SIMILARITY
+  with the group leader's (same service).
+
+The first alert of a group (the leader) runs the normal triage and Slack
+post; followers reuse the leader's suggestion as a threaded reply. LLM
+spend therefore tracks distinct problems, not pages. Groups live in the job
+queue database so all worker processes share them. ALERT_COALESCE=0 disables.
+"""
+
+import os, re, time, sqlite3, hashlib, logging, threading
+from collections import namedtuple
+import numpy as np
+from app.utils import metrics
+from app.utils.job_queue import JOB_QUEUE_PATH
+
+logger = logging.getLogger("autoresq")
+
+ALERT_COALESCE = os.getenv("ALERT_COALESCE", "1") == "1"
+COALESCE_WINDOW_SECONDS = float(os.getenv("ALERT_COALESCE_WINDOW_SECONDS", 900))
+COALESCE_SIMILARITY = float(os.getenv("ALERT_COALESCE_SIMILARITY", 0.92))
+LEADER_WAIT_SECONDS = float(os.getenv("ALERT_COALESCE_LEADER_WAIT_SECONDS", 300))
+GROUP_RETENTION_SECONDS = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_groups (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  fingerprint TEXT NOT NULL,
+  service TEXT,
+  embedding BLOB,
+  leader_event_id INTEGER,
+  leader_incident_id TEXT,
+  slack_ts TEXT,
+  ai_suggestion TEXT,
+  members INTEGER NOT NULL DEFAULT 1,
+  created_at REAL NOT NULL,
+  last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alert_groups_fp ON alert_groups(fingerprint, last_seen);
+CREATE INDEX IF NOT EXISTS idx_alert_groups_service ON alert_groups(service, last_seen);
+"""
+
+AlertGroup = namedtuple(
+    "AlertGroup",
+    "id leader leader_event_id leader_incident_id slack_ts ai_suggestion members created_at match",
+)
+
+_MASKS = (
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), "<uuid>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?z?\b"), "<ts>"),
+    (re.compile(r"\b\d{1,3}(\.\d{1,3}){3}(:\d+)?\b"), "<ip>"),
+    (re.compile(r"\b(?=[0-9a-f]*\d)[0-9a-f]{8,}\b"), "<hex>"),
+    (re.compile(r"\b[a-z]+(-[a-z0-9]+)*-\d+[a-z0-9-]*\b"), "<host>"),
+    (re.compile(r"\d+(\.\d+)?"), "<n>"),
+)
+
+
+def normalize_summary(summary: str) -> str:
+    """Lowercase and mask volatile tokens so repeats of one problem compare equal."""
+    text = (summary or "").lower()
+    for pattern, repl in _MASKS:
+        text = pattern.sub(repl, text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def alert_fingerprint(service: str, summary: str) -> str:
+    return hashlib.sha1(f"{(service or '').lower()}|{normalize_summary(summary)}".encode("utf-8")).hexdigest()
+
+
+_embeddings = None
+
+
+def _embed(summary: str):
+    """Unit-norm summary embedding (the embedding cache is shared with the triage query)."""
+    global _embeddings
+    try:
+        if _embeddings is None:
+            from app.llm_providers.registry import get_provider, provider_embeddings
+            from app.rag_engine.embedding_cache import cached_embeddings
+            _embeddings = cached_embeddings(provider_embeddings(), get_provider().embed_model)
+        vec = np.asarray(_embeddings.embed_query(summary), dtype="float32")
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else None
+    except Exception as e:
+        logger.warning("Alert embedding failed, coalescing by fingerprint only: %s", e)
+        return None
+
+
+class AlertCoalescer:
+    """Assigns alerts to leader/follower groups (SQLite-backed, multi-process safe)."""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def assign(self, service: str, summary: str, event_id=None, incident_id=None) -> AlertGroup:
+        """Join an open group for this alert, or open a new one with it as leader."""
+        now = time.time()
+        since = now - COALESCE_WINDOW_SECONDS
+        fingerprint = alert_fingerprint(service, summary)
+        conn = self._conn()
+        if event_id is not None:
+            # Retried job: the alert already leads its group
+            own = conn.execute("SELECT id FROM alert_groups WHERE leader_event_id=?", (event_id,)).fetchone()
+            if own is not None:
+                return self.get(own[0], leader=True, match="retry")
+        # Embed only when the cheap fingerprint lookup misses (new groups keep their vector)
+        fp_hit = conn.execute(
+            "SELECT 1 FROM alert_groups WHERE fingerprint=? AND last_seen>=? LIMIT 1", (fingerprint, since)
+        ).fetchone()
+        vec = _embed(summary) if not fp_hit and COALESCE_SIMILARITY < 1 else None
+
+        conn.execute("BEGIN IMMEDIATE")  # serialize assignment across workers/processes
+        try:
+            row = conn.execute(
+                "SELECT id FROM alert_groups WHERE fingerprint=? AND last_seen>=? ORDER BY last_seen DESC LIMIT 1",
+                (fingerprint, since),
+            ).fetchone()
+            match = "fingerprint" if row else None
+            if row is None and vec is not None:
+                best, best_sim = None, COALESCE_SIMILARITY
+                for gid, blob in conn.execute(
+                    "SELECT id, embedding FROM alert_groups WHERE service=? AND last_seen>=? AND embedding IS NOT NULL",
+                    (service, since),
+                ):
+                    other = np.frombuffer(blob, dtype="float32")
+                    if other.shape == vec.shape:
+                        sim = float(other @ vec)
+                        if sim >= best_sim:
+                            best, best_sim = gid, sim
+                if best is not None:
+                    row, match = (best,), f"similarity:{best_sim:.3f}"
+
+            if row is not None:
+                conn.execute("UPDATE alert_groups SET members=members+1, last_seen=? WHERE id=?", (now, row[0]))
+                group_id, leader = row[0], False
+            else:
+                conn.execute("DELETE FROM alert_groups WHERE last_seen<?", (now - GROUP_RETENTION_SECONDS,))
+                cur = conn.execute(
+                    """INSERT INTO alert_groups (fingerprint, service, embedding, leader_event_id, leader_incident_id,
+                       created_at, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (fingerprint, service, vec.tobytes() if vec is not None else None, event_id, incident_id, now, now),
+                )
+                group_id, leader, match = cur.lastrowid, True, "new"
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        group = self.get(group_id, leader=leader, match=match)
+        metrics.inc("autoresq_alerts_coalesced_total", role="leader" if leader else "follower",
+                    match=match.split(":")[0], help="Triggered alerts by coalescing role")
+        logger.info("Alert group | group=%s role=%s match=%s members=%s",
+                    group_id, "leader" if leader else "follower", match, group.members)
+        return group
+
+    def get(self, group_id: int, leader: bool = False, match: str = None) -> AlertGroup:
+        row = self._conn().execute(
+            """SELECT id, leader_event_id, leader_incident_id, slack_ts, ai_suggestion, members, created_at
+               FROM alert_groups WHERE id=?""",
+            (group_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        gid, *rest = row
+        return AlertGroup(gid, leader, *rest, match)
+
+    def set_suggestion(self, group_id: int, ai_suggestion: str):
+        self._conn().execute("UPDATE alert_groups SET ai_suggestion=? WHERE id=?", (ai_suggestion, group_id))
+
+    def set_slack_ts(self, group_id: int, ts: str):
+        self._conn().execute("UPDATE alert_groups SET slack_ts=? WHERE id=?", (ts, group_id))
+
+
+_coalescer = None
+_lock = threading.Lock()
+
+
+def get_coalescer() -> AlertCoalescer:
+    global _coalescer
+    if _coalescer is None:
+        with _lock:
+            if _coalescer is None:
+                _coalescer = AlertCoalescer()
+    return _coalescer
@@ -0,0 +1,166 @@
+"""
+AutoResQ - analytics.py
+-----------------------
+Incident rollups kept up to date as events and Slack actions are written.
+
+Tables (events DB, created by event_store migration v5):
+- incident_timeline(incident_id, service, opened_at, acked_at, resolved_at,
+  first_event_id, ai_source): one row per incident, times in epoch seconds.
+- analytics_hourly(bucket, service, metric, count, total): UTC hour buckets.
+  Metrics: `events`, `incidents` (first trigger), `ack` / `resolve` (count
+  and total seconds since open, bucketed by the hour the incident opened)
+  and `ai_<source>` (the triage path of the incident's suggestion, see
+  rag_ai_engine.triage: cache | zero_llm | sop | generic | error, or
+  coalesced), counted once per incident.
+
+The statement builders here return [(sql, params)] that EventStore runs in
+the same transaction as the event/action they describe, so rollups never
+drift from the rows. Dashboards read analytics_hourly only: every query
+costs O(buckets), not O(events).
+"""
+
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incident_timeline (
+  incident_id TEXT PRIMARY KEY,
+  service TEXT,
+  opened_at REAL NOT NULL,
+  acked_at REAL,
+  resolved_at REAL,
+  first_event_id INTEGER,
+  ai_source TEXT
+);
+CREATE TABLE IF NOT EXISTS analytics_hourly (
+  bucket TEXT NOT NULL,
+  service TEXT NOT NULL,
+  metric TEXT NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  total REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (bucket, service, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_analytics_metric ON analytics_hourly(metric, bucket);
+"""
+
+_BUCKET_SQL = "strftime('%Y-%m-%dT%H:00', {}, 'unixepoch')"
+
+_COUNT_UPSERT = " ON CONFLICT(bucket, service, metric) DO UPDATE SET count = count + 1, total = total + excluded.total"
+
+OPEN_INCIDENT = (
+    "INSERT OR IGNORE INTO incident_timeline (incident_id, service, opened_at, first_event_id) "
+    "VALUES (?, ?, ?, last_insert_rowid())"
+)
+# changes() = rows touched by the previous statement, so only a new incident counts
+COUNT_NEW_INCIDENT = "INSERT INTO analytics_hourly SELECT ?, ?, 'incidents', 1, 0 WHERE changes() = 1" + _COUNT_UPSERT
+COUNT = "INSERT INTO analytics_hourly VALUES (?, ?, ?, 1, 0)" + _COUNT_UPSERT
+COUNT_FIRST = "INSERT INTO analytics_hourly SELECT ?, ?, ?, 1, 0 WHERE changes() = 1" + _COUNT_UPSERT
+MARK = {
+    "ack": "UPDATE incident_timeline SET acked_at = ? WHERE incident_id = ? AND acked_at IS NULL",
+    "resolve": "UPDATE incident_timeline SET resolved_at = ? WHERE incident_id = ? AND resolved_at IS NULL",
+}
+# Only when the previous MARK / SET_AI_SOURCE changed a row: first ack / resolve / suggestion of the incident
+COUNT_DURATION = (
+    f"INSERT INTO analytics_hourly SELECT {_BUCKET_SQL.format('opened_at')}, COALESCE(service, 'unknown'), ?, 1, "
+    "? - opened_at FROM incident_timeline WHERE incident_id = ? AND changes() = 1" + _COUNT_UPSERT
+)
+SET_AI_SOURCE = "UPDATE incident_timeline SET ai_source = ? WHERE incident_id = ? AND ai_source IS NULL"
+INSERT_ACTION = (
+    "INSERT INTO actions (event_id, incident_id, action, user, created_at) "
+    "VALUES ((SELECT MAX(id) FROM events WHERE incident_id = ?), ?, ?, ?, ?)"
+)
+
+# PagerDuty incident status → timeline mark
+_STATUS_MARKS = {"ACKNOWLEDGED": "ack", "RESOLVED": "resolve"}
+
+
+def bucket(ts: float = None) -> str:
+    return time.strftime("%Y-%m-%dT%H:00", time.gmtime(time.time() if ts is None else ts))
+
+
+def mark_statements(incident_id: str, action: str, ts: float) -> list:
+    """First ack/resolve of an incident: timeline time + duration rollup."""
+    if action not in MARK:
+        return []
+    return [(MARK[action], (ts, incident_id)), (COUNT_DURATION, (action, ts, incident_id))]
+
+
+def event_statements(incident_id: str, service: str, status: str, ts: float) -> list:
+    """Rollup updates for an event just inserted (must directly follow the events INSERT)."""
+    service = service or "unknown"
+    statements = []
+    if status == "TRIGGERED":
+        statements += [(OPEN_INCIDENT, (incident_id, service, ts)), (COUNT_NEW_INCIDENT, (bucket(ts), service))]
+    statements.append((COUNT, (bucket(ts), service, "events")))
+    return statements + mark_statements(incident_id, _STATUS_MARKS.get(status), ts)
+
+
+def action_statements(incident_id: str, action: str, user: str, ts: float) -> list:
+    """Slack Acknowledge/Resolve: row in `actions` + timeline/rollups."""
+    created_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts))
+    return [(INSERT_ACTION, (incident_id, incident_id, action, user, created_at))] + mark_statements(incident_id, action, ts)
+
+
+def suggestion_statements(incident_id: str, service: str, source: str, ts: float) -> list:
+    """Suggestion source of an incident: set and counted only the first time (job retries are no-ops)."""
+    return [(SET_AI_SOURCE, (source, incident_id)), (COUNT_FIRST, (bucket(ts), service or "unknown", f"ai_{source}"))]
+
+
+# -------------------------------------------------------------------
+# Schema + one-off backfill (event_store migration v5)
+# -------------------------------------------------------------------
+def create_schema(conn):
+    for stmt in SCHEMA.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(actions)")}
+    for column in ("incident_id", "user"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE actions ADD COLUMN {column} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_actions_incident ON actions(incident_id)")
+
+    # Existing events: one pass now, incremental from here on
+    conn.execute("""
+        INSERT OR IGNORE INTO incident_timeline (incident_id, service, opened_at, first_event_id)
+        SELECT incident_id, COALESCE(service, 'unknown'), CAST(strftime('%s', MIN(received_at)) AS REAL), MIN(id)
+        FROM events WHERE event_type = 'TRIGGERED' AND incident_id IS NOT NULL AND received_at IS NOT NULL
+        GROUP BY incident_id
+    """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO analytics_hourly
+        SELECT {_BUCKET_SQL.format('opened_at')}, service, 'incidents', COUNT(*), 0
+        FROM incident_timeline GROUP BY 1, 2
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO analytics_hourly
+        SELECT substr(received_at, 1, 13) || ':00', COALESCE(service, 'unknown'), 'events', COUNT(*), 0
+        FROM events WHERE received_at IS NOT NULL GROUP BY 1, 2
+    """)
+
+
+# -------------------------------------------------------------------
+# Read side (rollups only)
+# -------------------------------------------------------------------
+def hourly(conn, since: str, metrics=None) -> list:
+    """[{bucket, service, metric, count, total}] from `since` (UTC hour bucket) on."""
+    sql = "SELECT bucket, service, metric, count, total FROM analytics_hourly WHERE bucket >= ?"
+    params = [since]
+    if metrics:
+        sql += f" AND metric IN ({','.join('?' * len(metrics))})"
+        params += list(metrics)
+    return [dict(row) for row in conn.execute(sql + " ORDER BY bucket", params)]
+
+
+def service_summary(conn, since: str) -> list:
+    """Per service: incidents, acks, resolves, MTTA and MTTR (seconds) since `since`."""
+    rows = conn.execute("""
+        SELECT service,
+               SUM(CASE WHEN metric = 'incidents' THEN count ELSE 0 END) AS incidents,
+               SUM(CASE WHEN metric = 'ack' THEN count ELSE 0 END) AS acks,
+               SUM(CASE WHEN metric = 'resolve' THEN count ELSE 0 END) AS resolves,
+               SUM(CASE WHEN metric = 'ack' THEN total END) / NULLIF(SUM(CASE WHEN metric = 'ack' THEN count END), 0) AS mtta_seconds,
+               SUM(CASE WHEN metric = 'resolve' THEN total END) / NULLIF(SUM(CASE WHEN metric = 'resolve' THEN count END), 0) AS mttr_seconds
+        FROM analytics_hourly
+        WHERE bucket >= ? AND metric IN ('incidents', 'ack', 'resolve')
+        GROUP BY service ORDER BY incidents DESC
+    """, (since,))
+    return [dict(row) for row in rows]
@@ -0,0 +1,116 @@
+"""
+AutoResQ - bench_event_writes.py
+--------------------------------
+Benchmarks event inserts/sec into a scratch events DB under concurrent
+webhook threads:
+- legacy: a new connection and transaction per event, payload stored twice
+  as pretty-printed JSON (`details` + `raw_json`), rollback journal;
+- group commit: the EventStore write-behind path at several batch sizes
+  and linger times, plain and zlib-compressed payloads.
+
+Run from the repo root:  python -m app.utils.bench_event_writes [events] [threads]
+"""
+
+import os, sys, json, time, sqlite3, logging, datetime, tempfile, threading
+from app.utils.event_store import BASE_SCHEMA, EventStore
+
+BATCH_SIZES = (1, 10, 50, 200)
+LINGER_MS = (0, 5)
+
+
+def make_payload(i: int) -> dict:
+    return {
+        "event": {
+            "event_type": "incident.triggered",
+            "data": {
+                "id": f"Q{i:012d}",
+                "type": "incident",
+                "title": f"Queue depth high on WMQ_IN ({5000 + i} messages)",
+                "summary": f"Queue depth exceeded 5000 on wmq-{i % 4:02d}",
+                "status": "triggered",
+                "urgency": "high",
+                "service": {"id": "PSVC01", "summary": "IBM MQ", "type": "service_reference"},
+                "html_url": f"https://example.pagerduty.com/incidents/Q{i:012d}",
+                "created_at": datetime.datetime.utcnow().isoformat(),
+            },
+        }
+    }
+
+
+def _run_threads(threads: int, events: int, write):
+    per_thread = events // threads
+
+    def worker(t):
+        for i in range(per_thread):
+            write(make_payload(t * per_thread + i))
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return per_thread * threads, time.perf_counter() - started
+
+
+def bench_legacy(path: str, events: int, threads: int):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASE_SCHEMA)
+    conn.execute("ALTER TABLE events ADD COLUMN incident_id TEXT")
+    conn.close()
+
+    def write(payload):
+        incident = payload["event"]["data"]
+        conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with conn:
+            conn.execute(
+                """INSERT INTO events (incident_id, received_at, event_type, summary, service, details, raw_json,
+                   ai_plan, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (incident["id"], datetime.datetime.utcnow().isoformat(), "TRIGGERED", incident["title"],
+                 "IBM MQ", json.dumps(incident, indent=2), json.dumps(payload, indent=2), "AI plan pending", "NEW"),
+            )
+
+    return _run_threads(threads, events, write)
+
+
+def bench_group_commit(path: str, events: int, threads: int, batch_rows: int, linger_ms: float, compress: bool):
+    import app.utils.event_store as event_store
+
+    event_store.EVENT_PAYLOAD_COMPRESS = compress
+    store = EventStore(path)
+    store._writer.batch_rows = batch_rows
+    store._writer.batch_seconds = linger_ms / 1000
+
+    def write(payload):
+        incident = payload["event"]["data"]
+        store.insert_event(incident["id"], datetime.datetime.utcnow().isoformat(), "TRIGGERED",
+                           incident["title"], "IBM MQ", payload, "AI plan pending")
+
+    return _run_threads(threads, events, write)
+
+
+def _db_bytes(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def main(events: int = 5000, threads: int = 16):
+    logging.getLogger("autoresq").setLevel(logging.WARNING)
+    print(f"events={events} threads={threads}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "legacy.db")
+        n, secs = bench_legacy(path, events, threads)
+        print(f"{'legacy per-event txn':<40}: {n / secs:10,.0f} inserts/s  db={_db_bytes(path) / 1024:8,.0f} KiB")
+        runs = [(rows, linger, False) for linger in LINGER_MS for rows in BATCH_SIZES]
+        runs.append((BATCH_SIZES[-1], 0, True))
+        for batch_rows, linger_ms, compress in runs:
+            path = os.path.join(tmp, f"gc-{batch_rows}-{linger_ms}-{compress}.db")
+            n, secs = bench_group_commit(path, events, threads, batch_rows, linger_ms, compress)
+            label = f"group commit batch={batch_rows} linger={linger_ms}ms{' zlib' if compress else ''}"
+            print(f"{label:<40}: {n / secs:10,.0f} inserts/s  db={_db_bytes(path) / 1024:8,.0f} KiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 16)
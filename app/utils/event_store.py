@@ -0,0 +1,371 @@
+"""
+AutoResQ - event_store.py
+-------------------------
+Shared access to the events database (DATABASE_PATH).
+
+- One connection per thread, reused for the life of the thread (webhook
+  handlers, job workers and the dashboard no longer open one per call).
+- WAL journaling with synchronous=NORMAL: dashboard reads do not block
+  webhook writes and vice versa; busy_timeout absorbs short write contention.
+- Statements are module constants with bound parameters, so sqlite's
+  per-connection statement cache reuses their prepared form.
+- The schema is versioned with PRAGMA user_version; `migrate()` applies the
+  pending MIGRATIONS in one write transaction (safe with several processes).
+- The webhook payload is stored once, as compact JSON in `events.payload`
+  (zlib-compressed with EVENT_PAYLOAD_COMPRESS=1). The old pretty-printed
+  `details` / `raw_json` copies are projected from it by the `event_details`
+  view (via the `payload_json()` SQL function registered on every
+  connection) or by `EventStore.event_details()`.
+- Writes go through a write-behind GroupCommitWriter (EVENT_WRITE_BEHIND,
+  default on): one writer thread commits everything queued while the
+  previous commit ran (optionally lingering EVENT_BATCH_MS for more, at most
+  EVENT_BATCH_ROWS rows) in a single transaction, so an alert storm costs one fsync per batch instead of one
+  per alert. Callers still wait for their commit, so an acknowledged
+  webhook is durable.
+- Events, Slack actions and suggestion sources update the analytics rollups
+  (app/utils/analytics.py) in the same transaction as their own row.
+- Old events are moved to monthly archive files by app/utils/retention.py;
+  the row stays as a slim summary whose `archived` column names its part.
+"""
+
+import os, json, time, zlib, queue, sqlite3, logging, threading
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from app.utils import metrics, analytics
+
+load_dotenv()
+logger = logging.getLogger("autoresq")
+
+DB_PATH = os.getenv("DATABASE_PATH")
+EVENT_DB_BUSY_TIMEOUT = float(os.getenv("EVENT_DB_BUSY_TIMEOUT", 30))
+EVENT_PAYLOAD_COMPRESS = os.getenv("EVENT_PAYLOAD_COMPRESS", "0") == "1"
+EVENT_WRITE_BEHIND = os.getenv("EVENT_WRITE_BEHIND", "1") == "1"
+EVENT_BATCH_MS = float(os.getenv("EVENT_BATCH_MS", 0))
+EVENT_BATCH_ROWS = int(os.getenv("EVENT_BATCH_ROWS", 200))
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  received_at TEXT,
+  event_type TEXT,
+  summary TEXT,
+  service TEXT,
+  details TEXT,
+  raw_json TEXT,
+  ai_plan TEXT,
+  status TEXT DEFAULT 'NEW'
+);
+CREATE TABLE IF NOT EXISTS actions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  event_id INTEGER,
+  action TEXT,
+  created_at TEXT
+);
+"""
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _m1_base_schema(conn):
+    for stmt in BASE_SCHEMA.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+
+
+def _m2_incident_id(conn):
+    # Older databases were created without the column the webhook writes
+    if "incident_id" not in _columns(conn, "events"):
+        conn.execute("ALTER TABLE events ADD COLUMN incident_id TEXT")
+
+
+def _m3_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_incident ON events(incident_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_service ON events(service, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_received ON events(received_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_status ON events(status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_actions_event ON actions(event_id)")
+
+
+def _m4_payload(conn):
+    # details/raw_json stay for rows written before v4; newer rows only fill payload
+    if "payload" not in _columns(conn, "events"):
+        conn.execute("ALTER TABLE events ADD COLUMN payload BLOB")
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS event_details AS
+        SELECT id, incident_id, received_at, event_type, summary, service, ai_plan, status,
+               COALESCE(details, json_extract(payload_json(payload), '$.event.data'),
+                        json_extract(payload_json(payload), '$.incident')) AS details,
+               COALESCE(raw_json, payload_json(payload)) AS raw_json
+        FROM events
+    """)
+
+
+def _m5_analytics(conn):
+    analytics.create_schema(conn)
+
+
+def _m6_archived(conn):
+    # archive part file (relative to EVENT_ARCHIVE_DIR) of rows slimmed by retention
+    if "archived" not in _columns(conn, "events"):
+        conn.execute("ALTER TABLE events ADD COLUMN archived TEXT")
+
+
+# user_version N means MIGRATIONS[:N] are applied; append only
+MIGRATIONS = [_m1_base_schema, _m2_incident_id, _m3_indexes, _m4_payload, _m5_analytics, _m6_archived]
+
+
+# -------------------------------------------------------------------
+# Payload encoding
+# -------------------------------------------------------------------
+def encode_payload(payload: dict, compress: bool = None) -> bytes:
+    """Compact JSON (no indentation), zlib-compressed when enabled (default: EVENT_PAYLOAD_COMPRESS)."""
+    data = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return zlib.compress(data) if (EVENT_PAYLOAD_COMPRESS if compress is None else compress) else data
+
+
+def payload_json(blob):
+    """JSON text of a stored payload, compressed or not (also the `payload_json` SQL function)."""
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return blob
+    blob = bytes(blob)
+    if blob[:1] == b"\x78":  # zlib header; compact JSON always starts with "{"
+        blob = zlib.decompress(blob)
+    return blob.decode("utf-8")
+
+
+INSERT_EVENT = """
+INSERT INTO events (incident_id, received_at, event_type, summary, service, payload, ai_plan, status)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+EVENT_DETAILS = "SELECT details, raw_json FROM event_details WHERE id=?"
+UPDATE_AI_PLAN = "UPDATE events SET ai_plan=? WHERE id=?"
+# Archived rows are re-inserted slim (same id: summary columns, shortened ai_plan, no payload).
+# Delete + insert rather than UPDATE: shrinking cells in place never frees a page.
+SLIM_EVENTS = [
+    """CREATE TEMP TABLE IF NOT EXISTS slim_events (id INTEGER PRIMARY KEY, incident_id TEXT, received_at TEXT,
+       event_type TEXT, summary TEXT, service TEXT, ai_plan TEXT, status TEXT)""",
+    "DELETE FROM temp.slim_events",
+    """INSERT INTO temp.slim_events SELECT id, incident_id, received_at, event_type, summary, service,
+       substr(ai_plan, 1, :ai_plan_chars), status FROM events WHERE id IN (SELECT value FROM json_each(:ids))""",
+    "DELETE FROM events WHERE id IN (SELECT id FROM temp.slim_events)",
+    """INSERT INTO events (id, incident_id, received_at, event_type, summary, service, ai_plan, status, archived)
+       SELECT *, :part FROM temp.slim_events""",
+]
+EVENT_PAGE = """
+SELECT id, incident_id, received_at, event_type, summary, service, status, archived
+FROM events WHERE {where} ORDER BY id DESC LIMIT ?
+"""
+
+
+def _execute_all(conn, statements):
+    rowid = None
+    for sql, params in statements:
+        cur = conn.execute(sql, params)
+        if rowid is None:
+            rowid = cur.lastrowid
+    return rowid
+
+
+class GroupCommitWriter:
+    """Write-behind buffer: one thread commits queued statements in batches."""
+
+    def __init__(self, store, batch_rows: int = EVENT_BATCH_ROWS, batch_ms: float = EVENT_BATCH_MS):
+        self.store = store
+        self.batch_rows = max(1, batch_rows)
+        self.batch_seconds = batch_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, statements) -> Future:
+        """Queue [(sql, params)] to run together; the future resolves to the
+        first statement's lastrowid once committed."""
+        future = Future()
+        self._queue.put((statements, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # whatever piled up during the last commit goes in this one
+            while len(batch) < self.batch_rows and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            deadline = time.monotonic() + self.batch_seconds
+            while len(batch) < self.batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        conn = self.store.conn()
+        started = time.perf_counter()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for statements, future in batch:
+                conn.execute("SAVEPOINT item")
+                try:
+                    rowid = _execute_all(conn, statements)
+                    conn.execute("RELEASE item")
+                    results.append((future, rowid, None))
+                except sqlite3.Error as e:  # only this item is undone; the rest of the batch commits
+                    conn.execute("ROLLBACK TO item")
+                    conn.execute("RELEASE item")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.error("Event batch commit failed | rows=%s error=%s", len(batch), e)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for future, rowid, error in results:
+            if error is None:
+                future.set_result(rowid)
+            else:
+                future.set_exception(error)
+        metrics.observe("autoresq_event_commit_seconds", time.perf_counter() - started,
+                        help="Events DB group-commit latency")
+        metrics.inc("autoresq_event_writes_total", len(batch), help="Statements written to the events DB")
+        metrics.inc("autoresq_event_commits_total", help="Events DB transactions committed")
+
+
+class EventStore:
+    """Per-thread pooled connections to the events database."""
+
+    def __init__(self, path: str = DB_PATH, write_behind: bool = EVENT_WRITE_BEHIND):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.migrate()
+        self._writer = GroupCommitWriter(self) if write_behind else None
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=EVENT_DB_BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False, cached_statements=128)
+            conn.row_factory = sqlite3.Row
+            conn.create_function("payload_json", 1, payload_json, deterministic=True)
+            # only takes effect on a new file, and must precede WAL (which writes the header);
+            # existing databases are converted once by `python -m app.utils.retention --vacuum`
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def migrate(self) -> int:
+        """Apply pending migrations. Returns the schema version.
+
+        The version only ever goes up: a database already migrated by a newer
+        build is left as is (migrations are additive, so older code keeps working).
+        """
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > len(MIGRATIONS):
+                logger.warning("⚠️ Events DB schema v%s is newer than this build (v%s); not migrating",
+                               version, len(MIGRATIONS))
+            for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+                step(conn)
+                logger.info("🗄️ Events DB migrated to v%s (%s)", number, step.__name__.lstrip("_"))
+            if version < len(MIGRATIONS):
+                conn.execute(f"PRAGMA user_version={len(MIGRATIONS)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return max(version, len(MIGRATIONS))
+
+    def _write(self, statements):
+        """Run [(sql, params)] in one transaction. Returns the first statement's lastrowid."""
+        if self._writer is not None:
+            return self._writer.submit(statements).result(timeout=EVENT_DB_BUSY_TIMEOUT)
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rowid = _execute_all(conn, statements)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rowid
+
+    def insert_event(self, incident_id, received_at, event_type, summary, service, payload: dict,
+                     ai_plan, status="NEW") -> int:
+        """Store one event (payload kept once, compact) and its rollups. Returns its id after commit."""
+        params = (incident_id, received_at, event_type, summary, service, encode_payload(payload), ai_plan, status)
+        return self._write(
+            [(INSERT_EVENT, params), *analytics.event_statements(incident_id, service, event_type, time.time())]
+        )
+
+    def update_ai_plan(self, event_id: int, ai_plan: str):
+        self._write([(UPDATE_AI_PLAN, (ai_plan, event_id))])
+
+    def record_action(self, incident_id: str, action: str, user: str):
+        """Slack Acknowledge/Resolve → `actions` row + incident timeline and MTTA/MTTR rollups."""
+        self._write(analytics.action_statements(incident_id, action, user, time.time()))
+
+    def record_suggestion(self, incident_id: str, service: str, source: str):
+        """Record an incident's suggestion source (triage path or "coalesced"), once per incident."""
+        self._write(analytics.suggestion_statements(incident_id, service, source, time.time()))
+
+    def mark_archived(self, event_ids, part: str, ai_plan_chars: int = 200):
+        """Slim rows whose full copy is now in archive `part`, in one transaction."""
+        params = {"ids": json.dumps(list(event_ids)), "ai_plan_chars": ai_plan_chars, "part": part}
+        self._write([(sql, params) for sql in SLIM_EVENTS])
+
+    def event_details(self, event_id: int):
+        """(details, raw_json) JSON text of one event, projected lazily from its payload."""
+        row = self.conn().execute(EVENT_DETAILS, (event_id,)).fetchone()
+        return (row["details"], row["raw_json"]) if row else (None, None)
+
+    def query_events(self, service: str = None, status: str = None, since: str = None, until: str = None,
+                     before_id: int = None, after_id: int = None, limit: int = 50) -> list:
+        """Newest-first page of events, filtered in SQL.
+
+        Keyset pagination on id: pass the last id of a page as before_id for the
+        next (older) page, or the newest id already shown as after_id to fetch
+        only rows added since. since/until bound received_at (ISO strings).
+        """
+        where, params = [], []
+        for clause, value in (("service=?", service), ("status=?", status), ("received_at>=?", since),
+                              ("received_at<?", until), ("id<?", before_id), ("id>?", after_id)):
+            if value is not None and value != "":
+                where.append(clause)
+                params.append(value)
+        sql = EVENT_PAGE.format(where=" AND ".join(where) or "1")
+        return [dict(row) for row in self.conn().execute(sql, (*params, limit))]
+
+    def distinct_values(self, column: str) -> list:
+        """Sorted distinct service/status values for filter pickers (index-only scan)."""
+        if column not in ("service", "status"):
+            raise ValueError(f"no filter on {column!r}")
+        return [row[0] for row in self.conn().execute(
+            f"SELECT DISTINCT {column} FROM events WHERE {column} IS NOT NULL ORDER BY {column}")]
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_event_store() -> EventStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = EventStore()
+    return _store
@@ -1,5 +1,6 @@
-import os, sqlite3, datetime
+import os, datetime
 from dotenv import load_dotenv
+from app.utils.event_store import get_event_store
 
 load_dotenv()
 
@@ -8,36 +9,11 @@ DB_PATH = os.getenv("DATABASE_PATH")
 # Make sure directory exists
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-SCHEMA = '''
-CREATE TABLE IF NOT EXISTS events (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  received_at TEXT,
-  event_type TEXT,
-  summary TEXT,
-  service TEXT,
-  details TEXT,
-  raw_json TEXT,
-  ai_plan TEXT,
-  status TEXT DEFAULT 'NEW'
-);
-CREATE TABLE IF NOT EXISTS actions (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  event_id INTEGER,
-  action TEXT,
-  created_at TEXT
-);
-'''
-
 def init_db():
-    """Initialize DB schema if not present."""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    with conn:
-        for stmt in SCHEMA.strip().split(';'):
-            s = stmt.strip()
-            if s:
-                conn.execute(s + ';')
-    print("✅ Database initialized with schema.")
-    return conn
+    """Create / migrate the schema (app/utils/event_store.py) and return a pooled connection."""
+    store = get_event_store()
+    print(f"✅ Database initialized with schema v{store.migrate()}.")
+    return store.conn()
 
 def seed_sample_data(conn):
     """Insert some mock incidents for testing."""
@@ -0,0 +1,269 @@
+"""
+AutoResQ - job_queue.py
+-----------------------
+Durable, SQLite-backed job queue and a bounded worker pool.
+
+Webhooks persist their event, `enqueue()` a job and return immediately;
+`JobWorkerPool` threads (started in `create_app`) claim jobs and run the
+handler registered for their kind.
+
+- Jobs survive restarts: a claimed job holds a lease (JOB_LEASE_SECONDS);
+  if the process dies, the lease expires and another worker picks it up.
+- Failed jobs are retried with exponential backoff up to JOB_MAX_ATTEMPTS,
+  then kept with status "failed" and the last error. A handler that is not
+  ready yet raises RetryLater(delay), which requeues without using an attempt.
+- Several processes (gunicorn workers) can share one queue file; claims are
+  serialized by SQLite's write lock.
+- Queue depth per status is exported as `autoresq_job_queue_depth`.
+"""
+
+import os, json, time, sqlite3, logging, threading
+from dotenv import load_dotenv
+from app.utils import metrics
+
+load_dotenv()
+logger = logging.getLogger("autoresq")
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "job_queue.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 300))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  available_at REAL NOT NULL,
+  lease_until REAL,
+  created_at REAL NOT NULL,
+  last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, available_at);
+"""
+
+
+class RetryLater(Exception):
+    """Raised by a handler to run the job again after `delay` seconds (not a failure)."""
+
+    def __init__(self, delay: float = 5.0):
+        super().__init__(f"retry in {delay}s")
+        self.delay = delay
+
+
+class JobQueue:
+    """Durable FIFO of (kind, payload) jobs."""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind: str, payload: dict, delay: float = 0.0) -> int:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO jobs (kind, payload, available_at, created_at) VALUES (?, ?, ?, ?)",
+            (kind, json.dumps(payload, separators=(",", ":")), now + delay, now),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        metrics.inc("autoresq_jobs_enqueued_total", kind=kind)
+        return cur.lastrowid
+
+    def enqueue_once(self, kind: str, payload: dict, delay: float = 0.0):
+        """Enqueue unless a job of this kind is already queued or running (one statement, so
+        several processes starting at once still leave a single job). Returns its id or None."""
+        now = time.time()
+        cur = self._conn().execute(
+            """INSERT INTO jobs (kind, payload, available_at, created_at) SELECT ?, ?, ?, ?
+               WHERE NOT EXISTS (SELECT 1 FROM jobs WHERE kind=? AND status IN ('queued', 'running'))""",
+            (kind, json.dumps(payload, separators=(",", ":")), now + delay, now, kind),
+        )
+        if not cur.rowcount:
+            return None
+        with self._wakeup:
+            self._wakeup.notify()
+        metrics.inc("autoresq_jobs_enqueued_total", kind=kind)
+        return cur.lastrowid
+
+    def claim(self):
+        """Lease the oldest ready job. Returns (id, kind, payload, attempts, created_at) or None."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """SELECT id, kind, payload, attempts, created_at FROM jobs
+                   WHERE (status='queued' AND available_at<=?) OR (status='running' AND lease_until<?)
+                   ORDER BY available_at, id LIMIT 1""",
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status='running', attempts=attempts+1, lease_until=? WHERE id=?",
+                    (now + JOB_LEASE_SECONDS, row[0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job_id, kind, payload, attempts, created_at = row
+        return job_id, kind, json.loads(payload), attempts + 1, created_at
+
+    def complete(self, job_id: int):
+        self._conn().execute("DELETE FROM jobs WHERE id=?", (job_id,))
+
+    def fail(self, job_id: int, attempts: int, error: str):
+        if attempts >= JOB_MAX_ATTEMPTS:
+            self._conn().execute(
+                "UPDATE jobs SET status='failed', lease_until=NULL, last_error=? WHERE id=?", (error, job_id)
+            )
+            return False
+        delay = min(300.0, 2 ** attempts)
+        self._conn().execute(
+            "UPDATE jobs SET status='queued', lease_until=NULL, available_at=?, last_error=? WHERE id=?",
+            (time.time() + delay, error, job_id),
+        )
+        return True
+
+    def defer(self, job_id: int, delay: float):
+        self._conn().execute(
+            "UPDATE jobs SET status='queued', attempts=attempts-1, lease_until=NULL, available_at=? WHERE id=?",
+            (time.time() + delay, job_id),
+        )
+
+    def depth(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def wait(self, timeout: float):
+        """Sleep until a local enqueue or timeout (other processes are picked up by polling)."""
+        with self._wakeup:
+            self._wakeup.wait(timeout)
+
+
+# -------------------------------------------------------------------
+# Worker pool
+# -------------------------------------------------------------------
+_handlers = {}
+
+
+def register_handler(kind: str, fn):
+    """fn(payload) runs one job; raising schedules a retry."""
+    _handlers[kind] = fn
+
+
+class JobWorkerPool:
+    """Bounded pool of daemon threads draining a JobQueue."""
+
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS):
+        self.queue = queue
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info("🧵 Job workers started | workers=%s queue=%s", self.workers, self.queue.path)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        with self.queue._wakeup:
+            self.queue._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim()
+            except sqlite3.OperationalError as e:
+                logger.warning("Job claim failed: %s", e)
+                job = None
+            if job is None:
+                self.queue.wait(JOB_POLL_SECONDS)
+                continue
+            self._execute(*job)
+
+    def _execute(self, job_id, kind, payload, attempts, created_at):
+        handler = _handlers.get(kind)
+        started = time.time()
+        metrics.observe("autoresq_job_wait_seconds", started - created_at, kind=kind,
+                        help="Time from enqueue to start of the last attempt")
+        try:
+            if handler is None:
+                raise RuntimeError(f"no handler registered for job kind {kind!r}")
+            handler(payload)
+        except RetryLater as e:
+            self.queue.defer(job_id, e.delay)
+            metrics.inc("autoresq_jobs_deferred_total", kind=kind)
+            return
+        except Exception as e:
+            retry = self.queue.fail(job_id, attempts, f"{type(e).__name__}: {e}")
+            metrics.inc("autoresq_jobs_failed_total", kind=kind, final=str(not retry).lower())
+            logger.exception("Job failed | id=%s kind=%s attempt=%s retry=%s", job_id, kind, attempts, retry)
+            return
+        self.queue.complete(job_id)
+        metrics.inc("autoresq_jobs_completed_total", kind=kind)
+        metrics.observe("autoresq_job_duration_seconds", time.time() - started, kind=kind)
+        logger.debug("Job done | id=%s kind=%s %.2fs", job_id, kind, time.time() - started)
+
+
+# -------------------------------------------------------------------
+# Process-wide queue
+# -------------------------------------------------------------------
+_queue = None
+_pool = None
+_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = JobQueue()
+                metrics.register_gauge(
+                    "autoresq_job_queue_depth",
+                    lambda: {(("status", s),): n for s, n in _queue.depth().items()},
+                    help="Jobs in the durable queue by status",
+                )
+    return _queue
+
+
+def enqueue(kind: str, payload: dict, delay: float = 0.0) -> int:
+    return get_queue().enqueue(kind, payload, delay)
+
+
+def start_workers(workers: int = JOB_WORKERS):
+    """Start the process-wide worker pool once (no-op when workers <= 0)."""
+    global _pool
+    queue = get_queue()
+    with _lock:
+        if _pool is not None or workers <= 0:
+            return _pool
+        _pool = JobWorkerPool(queue, workers)
+        _pool.start()
+    return _pool
@@ -0,0 +1,112 @@
+"""
+AutoResQ - metrics.py
+---------------------
+Minimal in-process metrics registry, exposed in Prometheus text format by
+`GET /metrics` (routes/metrics_routes.py).
+
+- inc(name, value, **labels)       counters
+- observe(name, seconds, **labels) latency histograms (count / sum / buckets)
+- register_gauge(name, fn)         gauges computed at scrape time; fn returns a
+                                   number or {labels-dict-as-tuple: number}
+"""
+
+import threading
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_counters = defaultdict(float)       # (name, labels) -> value
+_histograms = {}                     # (name, labels) -> [bucket counts..., count, sum]
+_gauges = {}                         # name -> (fn, help)
+_help = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, help: str = None, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+        if help:
+            _help[name] = help
+
+
+def observe(name: str, seconds: float, help: str = None, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+        if help:
+            _help[name] = help
+
+
+def register_gauge(name: str, fn, help: str = None):
+    with _lock:
+        _gauges[name] = fn
+        if help:
+            _help[name] = help
+
+
+def counter_value(name: str, **labels) -> float:
+    with _lock:
+        return _counters.get(_key(name, labels), 0.0)
+
+
+def _fmt_labels(labels, extra=()):
+    items = [*labels, *extra]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        gauges = dict(_gauges)
+        helps = dict(_help)
+
+    def header(name, kind):
+        if name in helps:
+            lines.append(f"# HELP {name} {helps[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            header(name, "counter")
+            seen.add(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), hist in sorted(histograms.items()):
+        if name not in seen:
+            header(name, "histogram")
+            seen.add(name)
+        for bound, count in zip(LATENCY_BUCKETS, hist):
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {hist[-2]}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {hist[-2]}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {round(hist[-1], 6)}")
+
+    for name, fn in sorted(gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        header(name, "gauge")
+        if isinstance(value, dict):
+            for labels, v in sorted(value.items()):
+                lines.append(f"{name}{_fmt_labels(labels)} {v}")
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
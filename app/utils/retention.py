@@ -0,0 +1,205 @@
+"""
+AutoResQ - retention.py
+-----------------------
+Retention, archival and compaction of the events database.
+
+- Events older than EVENT_RETENTION_DAYS are copied, EVENT_RETENTION_BATCH
+  rows at a time, to monthly archives under EVENT_ARCHIVE_DIR:
+  `events-YYYY-MM/part-<first id>-<last id>.parquet` (zstd) when pyarrow is
+  installed, else `.jsonl.gz`. Parts are written to a temp name and renamed,
+  so a crash never leaves a half-written one.
+- Only after its part exists is a row slimmed (EventStore.mark_archived):
+  payload dropped, ai_plan shortened, `archived` set. Ids, times, summary,
+  service and status stay, so the Incidents list, filters and analytics
+  rollups are unchanged.
+- Freed pages go back to the OS with `PRAGMA incremental_vacuum`. New events
+  databases are created with auto_vacuum=INCREMENTAL; an existing one needs a
+  one-off full VACUUM (`--vacuum` below, best in a quiet period: it blocks
+  writes while it runs). Until then freed pages are only reused.
+- Runs as the periodic `events_retention` job (every
+  EVENT_RETENTION_INTERVAL_SECONDS; EVENT_RETENTION_DAYS=0 disables). A run
+  stops after EVENT_RETENTION_MAX_ROWS rows or EVENT_RETENTION_MAX_SECONDS
+  (kept below the job lease) and continues in the next one; errors are
+  logged and the job is rescheduled rather than failed.
+
+Run from the repo root:
+    python -m app.utils.retention            # archive everything expired now
+    python -m app.utils.retention --vacuum   # one-off switch to incremental auto-vacuum first
+"""
+
+import os, glob, gzip, json, time, logging, argparse, datetime
+from app.utils import metrics
+from app.utils.event_store import DB_PATH, get_event_store
+from app.utils.job_queue import JOB_LEASE_SECONDS, RetryLater, get_queue, register_handler
+
+logger = logging.getLogger("autoresq")
+
+EVENT_RETENTION_DAYS = float(os.getenv("EVENT_RETENTION_DAYS", 90))
+EVENT_RETENTION_BATCH = int(os.getenv("EVENT_RETENTION_BATCH", 1000))
+EVENT_RETENTION_MAX_ROWS = int(os.getenv("EVENT_RETENTION_MAX_ROWS", 50000))
+EVENT_RETENTION_MAX_SECONDS = float(os.getenv("EVENT_RETENTION_MAX_SECONDS", JOB_LEASE_SECONDS / 3))
+EVENT_RETENTION_INTERVAL_SECONDS = float(os.getenv("EVENT_RETENTION_INTERVAL_SECONDS", 6 * 3600))
+EVENT_VACUUM_PAGES = int(os.getenv("EVENT_VACUUM_PAGES", 5000))
+EVENT_ARCHIVE_DIR = os.getenv("EVENT_ARCHIVE_DIR") or os.path.join(os.path.dirname(DB_PATH or "") or ".", "archive")
+AI_PLAN_SUMMARY_CHARS = 200
+_warned_no_auto_vacuum = False
+
+SELECT_EXPIRED = """
+SELECT id, incident_id, received_at, event_type, summary, service, status, ai_plan, details, raw_json
+FROM event_details WHERE id IN (
+  SELECT id FROM events WHERE archived IS NULL AND received_at < ? ORDER BY id LIMIT ?
+) ORDER BY id
+"""
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def write_archive_part(rows: list, month: str, archive_dir: str = EVENT_ARCHIVE_DIR) -> str:
+    """Write one month's rows as a part file. Returns its path relative to archive_dir."""
+    folder = os.path.join(archive_dir, f"events-{month}")
+    os.makedirs(folder, exist_ok=True)
+    name = f"part-{rows[0]['id']:012d}-{rows[-1]['id']:012d}"
+    if _parquet_available():
+        import pandas as pd
+        path = os.path.join(folder, name + ".parquet")
+        pd.DataFrame(rows).to_parquet(path + ".tmp", engine="pyarrow", compression="zstd", index=False)
+    else:
+        path = os.path.join(folder, name + ".jsonl.gz")
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as out:
+            for row in rows:
+                out.write(json.dumps(row, separators=(",", ":")) + "\n")
+    os.replace(path + ".tmp", path)
+    return os.path.relpath(path, archive_dir)
+
+
+def archive_expired(days: float = EVENT_RETENTION_DAYS, batch: int = EVENT_RETENTION_BATCH,
+                    max_rows: int = EVENT_RETENTION_MAX_ROWS, max_seconds: float = EVENT_RETENTION_MAX_SECONDS,
+                    archive_dir: str = EVENT_ARCHIVE_DIR):
+    """Archive + slim events older than `days`, stopping after max_rows rows or max_seconds.
+
+    Returns (archived, finished): finished is False when a limit stopped it first.
+    """
+    store = get_event_store()
+    cutoff = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
+    deadline = time.monotonic() + max_seconds
+    archived = 0
+    while archived < max_rows and time.monotonic() < deadline:
+        limit = min(batch, max_rows - archived)
+        rows = [dict(r) for r in store.conn().execute(SELECT_EXPIRED, (cutoff, limit))]
+        by_month = {}
+        for row in rows:
+            by_month.setdefault((row["received_at"] or "unknown")[:7], []).append(row)
+        for month, month_rows in by_month.items():
+            part = write_archive_part(month_rows, month, archive_dir)
+            store.mark_archived([row["id"] for row in month_rows], part, AI_PLAN_SUMMARY_CHARS)
+            archived += len(month_rows)
+        if len(rows) < limit:
+            return archived, True
+    return archived, False
+
+
+def full_vacuum():
+    """One-off: switch the events DB to auto_vacuum=INCREMENTAL (rewrites the file, blocks writers)."""
+    conn = get_event_store().conn()
+    started = time.perf_counter()
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    logger.info("🗜️ Events DB vacuumed, auto_vacuum=INCREMENTAL (%.1fs)", time.perf_counter() - started)
+
+
+def incremental_vacuum(pages: int = EVENT_VACUUM_PAGES) -> int:
+    """Return up to `pages` free pages to the OS. Returns how many were freed."""
+    if pages <= 0:
+        return 0
+    global _warned_no_auto_vacuum
+    conn = get_event_store().conn()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 = INCREMENTAL
+        if not _warned_no_auto_vacuum:
+            _warned_no_auto_vacuum = True
+            logger.warning("⚠️ Events DB is not in incremental auto-vacuum mode; freed pages are only reused. "
+                           "Run `python -m app.utils.retention --vacuum` once to enable it.")
+        return 0
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if before:
+        # executescript steps the pragma to completion (execute() frees a single page)
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def run_retention(**limits) -> bool:
+    """One bounded pass: archive expired events, then compact. Returns True when no expired event is left."""
+    started = time.perf_counter()
+    archived, finished = archive_expired(**limits)
+    freed = incremental_vacuum()
+    metrics.inc("autoresq_events_archived_total", archived, help="Events moved to archive files")
+    logger.info("🗄️ Retention: archived %s event(s) older than %s day(s) to %s, freed %s page(s) in %.1fs%s",
+                archived, EVENT_RETENTION_DAYS, EVENT_ARCHIVE_DIR, freed, time.perf_counter() - started,
+                "" if finished else " (more to do)")
+    return finished
+
+
+# -------------------------------------------------------------------
+# Periodic job
+# -------------------------------------------------------------------
+def _retention_job(_payload):
+    """Never fails (a failed job would stop retention until the next restart): one job row
+    requeues itself, straight away while a backlog remains."""
+    try:
+        finished = run_retention()
+    except Exception as e:
+        logger.exception("Retention run failed, retrying next interval | error=%s", e)
+        metrics.inc("autoresq_retention_failures_total", help="Events retention runs that raised")
+        finished = True
+    raise RetryLater(EVENT_RETENTION_INTERVAL_SECONDS if finished else 1.0)
+
+
+def schedule_retention():
+    """Queue the periodic retention job unless disabled or already queued (atomic across processes)."""
+    if EVENT_RETENTION_DAYS > 0:
+        get_queue().enqueue_once("events_retention", {})
+
+
+register_handler("events_retention", _retention_job)
+
+
+# -------------------------------------------------------------------
+# Read side (dashboard)
+# -------------------------------------------------------------------
+def archive_months(archive_dir: str = EVENT_ARCHIVE_DIR) -> list:
+    """Archived months (YYYY-MM), newest first."""
+    folders = glob.glob(os.path.join(archive_dir, "events-*"))
+    return sorted((os.path.basename(f)[len("events-"):] for f in folders), reverse=True)
+
+
+def archive_parts(month: str, archive_dir: str = EVENT_ARCHIVE_DIR) -> list:
+    folder = os.path.join(archive_dir, f"events-{month}")
+    return sorted(glob.glob(os.path.join(folder, "*.parquet")) + glob.glob(os.path.join(folder, "*.jsonl.gz")))
+
+
+def load_archive_month(month: str, archive_dir: str = EVENT_ARCHIVE_DIR):
+    """DataFrame of a month's archived events, newest first."""
+    import pandas as pd
+
+    frames = [pd.read_parquet(p) if p.endswith(".parquet") else pd.read_json(p, lines=True, dtype=False)
+              for p in archive_parts(month, archive_dir)]
+    if not frames:
+        return pd.DataFrame()
+    # a run interrupted between writing a part and slimming its rows re-archives them
+    return pd.concat(frames, ignore_index=True).drop_duplicates("id", keep="last").sort_values("id", ascending=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vacuum", action="store_true", help="one-off full VACUUM into incremental auto-vacuum mode")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    if args.vacuum:
+        full_vacuum()
+    while not run_retention(max_seconds=float("inf")):
+        pass